@@ -1,3 +1,4 @@
+import functools
 import logging
 import sys
 
@@ -22,3 +23,21 @@ def get_cap_handler(name):
         return sys.modules['cap.' + name]
     except ImportError:
         return unknown_cap
+
+def get_term_cap_handler(term, name):
+    # the handler is called with (context, cap_turple), caps without a
+    # module call the terminal method of the same name
+    module = get_cap_handler(name)
+
+    if module is unknown_cap:
+        method = getattr(term, name, None)
+
+        if method:
+            return unknown_cap.bind(method)
+
+    return functools.partial(module.handle, term)
+
+def get_cap_handlers(term, cap_names):
+    # resolve the handler of every cap once for the terminal, so no
+    # sequence looks up its module or method again
+    return dict([(name, get_term_cap_handler(term, name)) for name in cap_names])
@@ -6,5 +6,5 @@ def handle(term, context, cap_turple):
 		for idx in range(len(context.params)):
 			context.params[idx] -= 1 if context.params[idx] != 0 else 0
 
-	term.output_normal_data(' ' * context.params[0], True)
+	term.insert_chars(context.params[0])
 
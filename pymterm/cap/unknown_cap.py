@@ -1,13 +1,24 @@
 import logging
 
 
-def handle(term, context, cap_turple):
-    cap_name, increase_params = cap_turple
-    
-    if hasattr(term, cap_name):
+def bind(method):
+    # handler calling the terminal method of a cap without a module
+    def handle(context, cap_turple):
+        cap_name, increase_params = cap_turple
+
         if increase_params:
             for idx in range(len(context.params)):
                 context.params[idx] -= 1 if context.params[idx] != 0 else 0
-        getattr(term, cap_name)(context)
+        method(context)
+
+    return handle
+
+def handle(term, context, cap_turple):
+    cap_name, increase_params = cap_turple
+    
+    method = getattr(term, cap_name, None)
+
+    if method:
+        bind(method)(context, cap_turple)
     else:
         logging.error('No module named:{}, params:{}'.format(cap_name, context.params))
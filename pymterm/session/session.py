@@ -79,6 +79,9 @@ class Session(object):
 
         self._wait_for_quit()
 
+        if hasattr(self.terminal, 'close'):
+            self.terminal.close()
+
         if self.on_session_stop:
             self.on_session_stop(self)
 
@@ -178,6 +178,9 @@ class SessionConfig:
         #init render color table
         self.render_color_table = self.color_table[:]
 
+        #(fg, bg) render colors of the attribute ids, see determin_colors
+        self.attr_colors = {}
+
     def get_color(self, idx):
         return self.render_color_table[idx]
 
@@ -263,6 +266,40 @@ class SessionConfig:
 
         return [name for name in self.config['sessions']]
 
+    def _get_section_config(self, name, section):
+        #global section
+        if self.config and name in self.config:
+            section.update(self.config[name])
+
+        #session section
+        if (self.session_name
+                and self.config
+                and 'sessions' in self.config
+                and self.session_name in self.config['sessions']
+                and name in self.config['sessions'][self.session_name]):
+            section.update(self.config['sessions'][self.session_name][name])
+
+        return section
+
+    def get_scrollback_config(self):
+        return self._get_section_config('scrollback',
+                                        {'lines':1000, 'hot_screens':3, 'compress':True,
+                                         'spill':False, 'spill_dir':None})
+
+    def get_cursor_config(self):
+        #shape is one of block, underline and bar
+        return self._get_section_config('cursor',
+                                        {'shape':'block', 'blink':False, 'blink_interval':0.5})
+
+    def get_frame_interval(self):
+        #frames per second of the display, 0 draws on the next frame tick
+        frame_rate = 60
+
+        if self.config and 'render' in self.config and 'frame_rate' in self.config['render']:
+            frame_rate = self.config['render']['frame_rate']
+
+        return 1.0 / frame_rate if frame_rate > 0 else 0
+
     def get_font_info(self):
         font_size = 17
         font_file = None
@@ -439,4 +476,8 @@ class SessionConfig:
 
         self.default_foreground_color = gen_color_func(self.default_foreground_color)
         self.default_background_color = gen_color_func(self.default_background_color)
+        #the block cursor is drawn over the text, keep the text readable
+        self.cursor_overlay_color = gen_color_func(self.default_cursor_color[:3] + [0x80])
         self.default_cursor_color = gen_color_func(self.default_cursor_color)
+
+        self.attr_colors = {}
@@ -1,4 +1,6 @@
 #__init__.py
+from array import array
+from itertools import count, groupby
 
 class TextMode:
     STDOUT = 0
@@ -23,77 +25,80 @@ def reserve(l, size, default=None):
 DEFAULT_FG_COLOR_IDX = 256
 DEFAULT_BG_COLOR_IDX = 257
 
+# an attribute is packed into one int: fg color index, bg color index
+# and one bit for each TextMode
+COLOR_IDX_BITS = 10
+COLOR_IDX_MASK = (1 << COLOR_IDX_BITS) - 1
+BG_SHIFT = COLOR_IDX_BITS
+MODE_SHIFT = COLOR_IDX_BITS * 2
+MODE_MASK = ~((1 << MODE_SHIFT) - 1)
+FG_MASK = ~COLOR_IDX_MASK
+BG_MASK = ~(COLOR_IDX_MASK << BG_SHIFT)
+
+def pack_attr(f_color_idx, b_color_idx, mode = {}):
+    if f_color_idx is None:
+        f_color_idx = DEFAULT_FG_COLOR_IDX
+    if b_color_idx is None:
+        b_color_idx = DEFAULT_BG_COLOR_IDX
+
+    value = (f_color_idx & COLOR_IDX_MASK) | ((b_color_idx & COLOR_IDX_MASK) << BG_SHIFT)
+
+    for m in mode or {}:
+        if mode[m]:
+            value |= 1 << (MODE_SHIFT + m)
+
+    return value
+
 class TextAttribute(object):
     def __init__(self, f_color_idx, b_color_idx, mode = {}):
         super(TextAttribute, self).__init__()
 
-        self._f_color_idx = f_color_idx
-        self._b_color_idx = b_color_idx
-        self._mode = {}
-        self._mode.update(mode)
-
-        self._hashed_value = (None, None, None)
-        self._hash = None
-        self.get_hash_value()
+        self._value = pack_attr(f_color_idx, b_color_idx, mode)
 
     def need_calc_hash(self):
-        return not (self._hashed_value[0] == self._f_color_idx and
-                        self._hashed_value[1] == self._b_color_idx and
-                        self._hashed_value[2] == self._mode)
+        return False
 
     def get_hash_value(self):
-        if not self.need_calc_hash():
-            return self._hash
+        return self._value
 
-        mode = {}
-        mode.update(self._mode)
-
-        self._hashed_value = (self._f_color_idx, self._b_color_idx, mode)
-        self._hash = str(self)
-
-        return self._hash
+    def get_value(self):
+        return self._value
 
     def set_mode(self, text_mode):
-        self._mode[text_mode] = True
+        self._value |= 1 << (MODE_SHIFT + text_mode)
 
     def reset_mode(self):
-        self._mode.clear()
+        self._value &= ~MODE_MASK
 
     def get_mode(self):
-        return self._mode
+        return dict([(m, True) for m in range(TextMode.DIM + 1) if self.has_mode(m)])
 
     def unset_mode(self, text_mode):
-        self._mode[text_mode] = False
+        self._value &= ~(1 << (MODE_SHIFT + text_mode))
 
     def has_mode(self, text_mode):
-        try:
-            return self._mode[text_mode]
-        except:
-            self.unset_mode(text_mode)
-            return False
+        return (self._value >> (MODE_SHIFT + text_mode)) & 1 == 1
 
     def set_fg_idx(self, fg_idx):
-        self._f_color_idx = fg_idx
+        self._value = (self._value & FG_MASK) | (fg_idx & COLOR_IDX_MASK)
 
     def reset_fg_idx(self):
-        self._f_color_idx = DEFAULT_FG_COLOR_IDX
+        self.set_fg_idx(DEFAULT_FG_COLOR_IDX)
 
     def set_bg_idx(self, bg_idx):
-        self._b_color_idx = bg_idx
+        self._value = (self._value & BG_MASK) | ((bg_idx & COLOR_IDX_MASK) << BG_SHIFT)
 
     def reset_bg_idx(self):
-        self._b_color_idx = DEFAULT_BG_COLOR_IDX
+        self.set_bg_idx(DEFAULT_BG_COLOR_IDX)
 
     def get_fg_idx(self):
-        return self._f_color_idx
+        return self._value & COLOR_IDX_MASK
 
     def get_bg_idx(self):
-        return self._b_color_idx
+        return (self._value >> BG_SHIFT) & COLOR_IDX_MASK
 
     def equals(self, attr):
-        return (self._f_color_idx == attr._f_color_idx and
-                    self._b_color_idx == attr._b_color_idx and
-                    self._mode == attr._mode)
+        return self._value == attr._value
 
     def to_print_str(self):
         m = 'bold:{}, dim:{}, selection:{}, reverse:{}, cursor:{}, default:{}'.format(
@@ -107,27 +112,54 @@ class TextAttribute(object):
         return ','.join([str(self.get_fg_idx()), str(self.get_bg_idx()), m])
 
     def __str__(self):
-        return ''.join([str(self.get_fg_idx()), str(self.get_bg_idx()), str(self._mode)])
+        return ''.join([str(self.get_fg_idx()), str(self.get_bg_idx()), str(self.get_mode())])
 
     def __clone__(self):
         return clone_attr(self)
 
+class InternedTextAttribute(TextAttribute):
+    '''the shared attribute of a packed value, see get_attr_by_id'''
+    def __init__(self, value):
+        self._value = value
+
+    def _read_only(self, *args):
+        raise AttributeError('interned text attribute can not be changed')
+
+    set_mode = unset_mode = reset_mode = _read_only
+    set_fg_idx = reset_fg_idx = set_bg_idx = reset_bg_idx = _read_only
+
 def get_default_text_attribute():
     return TextAttribute(DEFAULT_FG_COLOR_IDX,
                              DEFAULT_BG_COLOR_IDX,
                              {})
 def clone_attr(attr):
-    mode = {}
-    mode.update(attr.get_mode())
+    a = TextAttribute(0, 0)
+    a._value = attr._value
+
+    return a
+
+# cells of lines keep the packed value of the attribute as its id,
+# get_attr_by_id gives the interned attribute object of an id
+_attrs = {}
+
+def get_attr_id(attr):
+    return attr._value
 
-    return TextAttribute(attr.get_fg_idx(), attr.get_bg_idx(), mode)
+def get_attr_by_id(attr_id):
+    try:
+        return _attrs[attr_id]
+    except KeyError:
+        attr = _attrs[attr_id] = InternedTextAttribute(attr_id)
+        return attr
+
+DEFAULT_ATTR_ID = get_attr_id(get_default_text_attribute())
 
 class Cell(object):
     def __init__(self, c = ' ', attr = get_default_text_attribute(), wide_char = False):
         super(Cell, self).__init__()
 
         self._char = c
-        self._attr = clone_attr(attr)
+        self._attr = get_attr_by_id(get_attr_id(attr))
         self._is_wide_char = wide_char
 
         self._hashed_value = None
@@ -145,7 +177,7 @@ class Cell(object):
             return self._hash
 
         self._hashed_value = self._char
-        self._hash = '_'.join([self._char, self._attr.get_hash_value()])
+        self._hash = (self._char, self._attr.get_hash_value())
 
         return self._hash
 
@@ -156,7 +188,7 @@ class Cell(object):
         return self._char
 
     def set_attr(self, attr):
-        self._attr = clone_attr(attr)
+        self._attr = get_attr_by_id(get_attr_id(attr))
         self._hashed_value = None
 
     def get_attr(self):
@@ -178,52 +210,253 @@ class Cell(object):
 
     def need_draw(self):
         return self._char != ' ' \
-          or self._attr.has_mode(TextMode.CURSOR) \
-          or self._attr.has_mode(TextMode.SELECTION) \
-          or self._attr.get_bg_idx != DEFAULT_BG_COLOR_IDX
+          or self._attr.get_bg_idx() != DEFAULT_BG_COLOR_IDX
+
+class CellView(object):
+    '''a cell of a line, reads and writes go to the arrays of the line'''
+    __slots__ = ('_line', '_col')
+
+    def __init__(self, line, col):
+        self._line = line
+        self._col = col
+
+    def __clone__(self):
+        return Cell(self.get_char(), self.get_attr(), self.is_widechar())
+
+    def get_hash_value(self):
+        return (self.get_char(), self._line._attrs[self._col])
+
+    def set_char(self, c):
+        self._line.set_cell(self._col, c = c)
+
+    def get_char(self):
+        return self._line._chars[self._col]
+
+    def set_attr(self, attr):
+        self._line.set_cell(self._col, attr_id = get_attr_id(attr))
+
+    def get_attr(self):
+        return get_attr_by_id(self._line._attrs[self._col])
+
+    def reset(self, attr=get_default_text_attribute()):
+        self._line.set_cell(self._col, c = u' ', attr_id = get_attr_id(attr))
+
+    def copy(self, cell):
+        self._line.set_cell(self._col, c = cell.get_char(), attr_id = get_attr_id(cell.get_attr()))
+
+    def is_widechar(self):
+        return self._line._wide_chars[self._col] != 0
+
+    def set_is_wide_char(self, wide_char):
+        self._line.set_cell(self._col, wide_char = wide_char)
+
+    def need_draw(self):
+        attr = self.get_attr()
+
+        return self.get_char() != ' ' \
+          or attr.get_bg_idx() != DEFAULT_BG_COLOR_IDX
+
+# revisions are unique over all lines, a line gets a new one on every change
+_line_revisions = count(1)
+
+# blank cells are copied from these in one go, grown when a longer line needs them
+_blank_chars = array('u')
+_blank_attrs = array('I')
+
+def get_blank_cells(count):
+    '''chars and attrs arrays of count blank cells'''
+    global _blank_chars, _blank_attrs
+
+    if count > len(_blank_chars):
+        size = max(count, len(_blank_chars) * 2, 256)
+        _blank_chars = array('u', u' ' * size)
+        _blank_attrs = array('I', [DEFAULT_ATTR_ID]) * size
+
+    return _blank_chars[:count], _blank_attrs[:count]
+
+def create_blank_lines(count, cols = 0):
+    '''count blank lines, a line without cols has no cells until they are used'''
+    if cols <= 0:
+        return [Line() for i in range(count)]
+
+    lines = []
+    for i in range(count):
+        line = Line()
+        line._chars, line._attrs = get_blank_cells(cols)
+        line._wide_chars = bytearray(cols)
+        lines.append(line)
+
+    return lines
 
 class Line(object):
+    '''cells of a line kept in parallel arrays
+
+    chars holds one unicode char per cell, attrs the interned attribute id
+    and wide_chars a flag per cell, get_cell/get_cells return CellView
+    objects working on the arrays
+
+    the revision tells if a line changed, the content hash is only built
+    when get_hash_value is called
+    '''
     def __init__(self):
         super(Line, self).__init__()
 
-        self._cells = []
-        self._hash_calc_done = False
+        self._chars = array('u')
+        self._attrs = array('I')
+        self._wide_chars = bytearray()
         self._hash = None
+        self._revision = next(_line_revisions)
 
     def __clone__(self):
         l = Line()
 
-        l._cells = [Cell(c.get_char(), c.get_attr(), c.is_widechar()) for c in self._cells]
+        l._chars = array('u', self._chars)
+        l._attrs = array('I', self._attrs)
+        l._wide_chars = bytearray(self._wide_chars)
 
         return l
 
     def c(self):
         return self.__clone__()
 
+    def freeze(self):
+        '''a copy of the line with the same revision and hash, for snapshots'''
+        l = self.__clone__()
+        l._revision = self._revision
+        l._hash = self._hash
+
+        return l
+
+    def _touch(self):
+        self._revision = next(_line_revisions)
+        self._hash = None
+
+    def get_revision(self):
+        return self._revision
+
     def need_calc_hash(self):
-        return (not self._hash_calc_done) or any([cell.need_calc_hash() for cell in self._cells])
+        return self._hash is None
 
     def get_hash_value(self):
-        if not self.need_calc_hash():
-            return self._hash
-
-        self._hash_calc_done = True
-        self._hash = '|'.join([cell.get_hash_value() for cell in self._cells])
+        if self._hash is None:
+            self._hash = (self._chars.tounicode(), self._attrs.tostring(), str(self._wide_chars))
 
         return self._hash
 
     def alloc_cells(self, cols, fit=False):
-        reserve(self._cells, cols, Cell())
+        count = cols - len(self._chars)
+
+        if count > 0:
+            chars, attrs = get_blank_cells(count)
+            self._chars.extend(chars)
+            self._attrs.extend(attrs)
+            self._wide_chars.extend(bytearray(count))
+            self._touch()
+        elif fit and count < 0:
+            del self._chars[cols:]
+            del self._attrs[cols:]
+            del self._wide_chars[cols:]
+            self._touch()
+
+    def set_cell(self, col, c = None, attr_id = None, wide_char = None):
+        if c is not None:
+            self._chars[col] = unicode(c)
+        if attr_id is not None:
+            self._attrs[col] = attr_id
+        if wide_char is not None:
+            self._wide_chars[col] = 1 if wide_char else 0
+
+        self._touch()
+
+    def write_cells(self, col, chars, attr, wide_chars):
+        count = len(chars)
+
+        self.alloc_cells(col + count)
+
+        self._chars[col:col + count] = array('u', u''.join(chars))
+        self._attrs[col:col + count] = array('I', [get_attr_id(attr)]) * count
+        self._wide_chars[col:col + count] = bytearray(wide_chars)
+        self._touch()
+
+    def fill_cells(self, begin_col = 0, end_col = -1, attr_id = DEFAULT_ATTR_ID):
+        '''blank the cells from begin_col to end_col with attr_id by slices'''
+        if end_col < 0:
+            end_col = self.cell_count()
+        begin_col = max(begin_col, 0)
+
+        if begin_col >= end_col:
+            return
+
+        self.alloc_cells(end_col)
+
+        count = end_col - begin_col
+        chars, attrs = get_blank_cells(count)
+
+        if attr_id != DEFAULT_ATTR_ID:
+            attrs = array('I', [attr_id]) * count
+
+        #erasing blank cells again keeps the revision
+        if self._chars[begin_col:end_col] == chars and self._attrs[begin_col:end_col] == attrs:
+            return
+
+        self._chars[begin_col:end_col] = chars
+        self._attrs[begin_col:end_col] = attrs
+        self._touch()
 
-        if fit and self.cell_count() > cols:
-            self._cells = self._cells[:cols]
+    def insert_cells(self, col, count, attr_id = DEFAULT_ATTR_ID, max_cols = -1):
+        '''move the cells from col right by count blank cells, cells past
+        max_cols are dropped'''
+        if count <= 0:
+            return
+
+        self.alloc_cells(col)
+
+        chars, attrs = get_blank_cells(count)
+
+        if attr_id != DEFAULT_ATTR_ID:
+            attrs = array('I', [attr_id]) * count
+
+        self._chars[col:col] = chars
+        self._attrs[col:col] = attrs
+        self._wide_chars[col:col] = bytearray(count)
+
+        if max_cols >= 0 and len(self._chars) > max_cols:
+            del self._chars[max_cols:]
+            del self._attrs[max_cols:]
+            del self._wide_chars[max_cols:]
+
+        self._touch()
+
+    def delete_cells(self, col, count, attr_id = DEFAULT_ATTR_ID):
+        '''move the cells after col + count left to col, blank cells fill the end'''
+        count = min(count, len(self._chars) - col)
+
+        if count <= 0:
+            return
+
+        del self._chars[col:col + count]
+        del self._attrs[col:col + count]
+        del self._wide_chars[col:col + count]
+
+        chars, attrs = get_blank_cells(count)
+
+        if attr_id != DEFAULT_ATTR_ID:
+            attrs = array('I', [attr_id]) * count
+
+        self._chars.extend(chars)
+        self._attrs.extend(attrs)
+        self._wide_chars.extend(bytearray(count))
+        self._touch()
 
     def insert_cell(self, col, cell):
-        self._cells.insert(col, cell)
+        self._chars.insert(col, unicode(cell.get_char()))
+        self._attrs.insert(col, get_attr_id(cell.get_attr()))
+        self._wide_chars.insert(col, 1 if cell.is_widechar() else 0)
+        self._touch()
 
     def get_cell(self, col):
         self.alloc_cells(col + 1)
-        return self._cells[col]
+        return CellView(self, col)
 
     def get_text(self, begin_col = 0, end_col = -1, raw = False):
         if end_col < 0 or end_col > self.cell_count():
@@ -236,40 +469,37 @@ class Line(object):
         if begin_col >= end_col:
             return ''
 
-        raw_text = ''.join([self._cells[i].get_char() for i in range(begin_col, end_col)])
+        raw_text = self._chars[begin_col:end_col].tounicode()
 
         return raw_text if raw else raw_text.replace('\000', '')
 
     def get_cells(self):
-        return self._cells
+        return [CellView(self, i) for i in range(len(self._chars))]
 
     def cell_count(self):
-        return len(self._cells)
+        return len(self._chars)
 
-    def select_cells(self, begin_col = 0, end_col = -1):
-        if end_col < 0 or end_col > self.cell_count():
-            end_col = self.cell_count()
-        if begin_col < 0:
-            begin_col = 0
-        if begin_col > self.cell_count():
-            begin_col = self.cell_count()
+    def encode(self):
+        '''compact form of the line: text, attribute runs and the wide char flags'''
+        spans = [(attr_id, len(list(g))) for attr_id, g in groupby(self._attrs)]
+        wide_chars = str(self._wide_chars) if 1 in self._wide_chars else ''
 
-        if begin_col >= end_col:
-            return
+        return (self._chars.tounicode(), spans, wide_chars)
 
-        self.alloc_cells(end_col)
+    def reset(self):
+        count = len(self._chars)
 
-        for i in range(begin_col, end_col):
-            self._cells[i].get_attr().set_mode(TextMode.SELECTION)
+        self._chars, self._attrs = get_blank_cells(count)
+        self._touch()
 
-    def clear_selection(self):
-        for cell in self._cells:
-            cell.get_attr().unset_mode(TextMode.SELECTION)
+def decode_line(data):
+    '''the line of a Line.encode result'''
+    text, spans, wide_chars = data
 
-    def get_selection_text(self):
-        selected_cells = filter(lambda x: x.get_attr().has_mode(TextMode.SELECTION), self._cells)
-        return map(lambda x:x.get_char(), selected_cells)
+    line = Line()
+    line._chars = array('u', text)
+    for attr_id, n in spans:
+        line._attrs.extend(array('I', [attr_id]) * n)
+    line._wide_chars = bytearray(wide_chars) if wide_chars else bytearray(len(text))
 
-    def reset(self):
-        for c in self._cells:
-            c.reset()
+    return line
@@ -41,3 +41,4 @@ def translate_char(c):
 def translate_char_british(c):
     if c == '#':
         return unichr(0x00a3)
+    return c
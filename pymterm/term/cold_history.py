@@ -0,0 +1,91 @@
+import marshal
+import zlib
+
+from collections import deque
+
+from term import decode_line
+
+BLOCK_SIZE = 64
+COMPRESS_LEVEL = 1
+
+
+class ColdHistory(object):
+    '''history lines far above the screen, kept in their encoded form
+
+    lines are encoded with Line.encode and grouped in blocks of
+    BLOCK_SIZE lines, a full block is marshaled and zlib compressed when
+    compress is on, get_line decodes a block only when one of its lines is
+    asked for, the last decoded block is kept
+    '''
+    def __init__(self, compress = True, block_size = BLOCK_SIZE):
+        super(ColdHistory, self).__init__()
+
+        self._compress = compress
+        self._block_size = block_size
+        self._blocks = deque()
+        self._open_block = []
+        self._first_block_offset = 0
+        self._count = 0
+
+        self._decoded_block = None
+        self._decoded_lines = None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, line):
+        self._open_block.append(line.encode())
+        self._count += 1
+
+        if len(self._open_block) == self._block_size:
+            self._blocks.append(self._seal_block(self._open_block))
+            self._open_block = []
+
+    def pop_oldest(self):
+        '''remove the oldest line, return it in the Line.encode form'''
+        if self._count == 0:
+            raise IndexError('pop from empty history')
+
+        self._count -= 1
+
+        if len(self._blocks) == 0:
+            return self._open_block.pop(0)
+
+        data = self._get_block_lines(self._blocks[0])[self._first_block_offset]
+        self._first_block_offset += 1
+
+        if self._first_block_offset == self._block_size:
+            self._blocks.popleft()
+            self._first_block_offset = 0
+
+        return data
+
+    def get_line(self, index):
+        if index < 0 or index >= self._count:
+            raise IndexError('history line out of range:{}'.format(index))
+
+        block_index, pos = divmod(index + self._first_block_offset, self._block_size)
+
+        if block_index == len(self._blocks):
+            return decode_line(self._open_block[pos])
+
+        return decode_line(self._get_block_lines(self._blocks[block_index])[pos])
+
+    def get_lines(self, begin, end):
+        return [self.get_line(i) for i in range(max(begin, 0), min(end, self._count))]
+
+    def _seal_block(self, lines):
+        if not self._compress:
+            return lines
+
+        return zlib.compress(marshal.dumps(lines), COMPRESS_LEVEL)
+
+    def _get_block_lines(self, block):
+        if not self._compress:
+            return block
+
+        if self._decoded_block is not block:
+            self._decoded_lines = marshal.loads(zlib.decompress(block))
+            self._decoded_block = block
+
+        return self._decoded_lines
@@ -0,0 +1,122 @@
+import logging
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+
+from term import decode_line
+
+LOGGER = logging.getLogger('disk_history')
+
+INDEX_RECORD = struct.Struct('<Q')
+
+
+class DiskHistory(object):
+    '''history lines spilled to files of the session
+
+    every line is written as a marshaled Line.encode record to a data
+    file and the offset of the record to an index file, lines are read
+    back through mmap of both files, so any line can be reached without
+    loading the files. the files are created with the first line and
+    removed right away where open files can be removed, so they never
+    outlive the process even when it crashes, on windows close removes them
+    '''
+    def __init__(self, spill_dir = None):
+        super(DiskHistory, self).__init__()
+
+        self._spill_dir = spill_dir
+        self._data_path = self._index_path = None
+        self._data_file = self._index_file = None
+        self._data_map = self._index_map = None
+        self._data_size = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _open(self):
+        fd, data_path = tempfile.mkstemp(prefix='pymterm-', suffix='.history', dir=self._spill_dir)
+        self._data_file = os.fdopen(fd, 'w+b')
+
+        fd, index_path = tempfile.mkstemp(prefix='pymterm-', suffix='.index', dir=self._spill_dir)
+        self._index_file = os.fdopen(fd, 'w+b')
+
+        LOGGER.info('spill history to:{}'.format(data_path))
+
+        if os.name == 'nt':
+            self._data_path, self._index_path = data_path, index_path
+        else:
+            #the files are only reached through the open files from now on
+            for path in (data_path, index_path):
+                os.remove(path)
+
+    def append(self, data):
+        '''append a line in the Line.encode form'''
+        if self._data_file is None:
+            self._open()
+
+        record = marshal.dumps(data)
+
+        self._index_file.write(INDEX_RECORD.pack(self._data_size))
+        self._data_file.write(record)
+        self._data_size += len(record)
+        self._count += 1
+
+    def _map_file(self, f):
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_maps(self):
+        for m in (self._data_map, self._index_map):
+            if m is not None:
+                m.close()
+
+        self._data_map = self._index_map = None
+
+    def _update_maps(self, index):
+        if self._index_map is not None \
+                and len(self._index_map) >= (index + 1) * INDEX_RECORD.size:
+            return
+
+        #the line is written after the files were mapped
+        self._data_file.flush()
+        self._index_file.flush()
+
+        self._close_maps()
+        self._data_map = self._map_file(self._data_file)
+        self._index_map = self._map_file(self._index_file)
+
+    def get_line(self, index):
+        if index < 0 or index >= self._count:
+            raise IndexError('history line out of range:{}'.format(index))
+
+        self._update_maps(index)
+
+        pos = index * INDEX_RECORD.size
+        begin = INDEX_RECORD.unpack_from(self._index_map, pos)[0]
+
+        if pos + INDEX_RECORD.size * 2 <= len(self._index_map):
+            end = INDEX_RECORD.unpack_from(self._index_map, pos + INDEX_RECORD.size)[0]
+        else:
+            end = len(self._data_map)
+
+        return decode_line(marshal.loads(self._data_map[begin:end]))
+
+    def close(self):
+        self._close_maps()
+
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.close()
+
+        for path in (self._data_path, self._index_path):
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    LOGGER.exception('unable to remove history file:{}'.format(path))
+
+        self._data_path = self._index_path = None
+        self._data_file = self._index_file = None
+        self._data_size = 0
+        self._count = 0
@@ -0,0 +1,151 @@
+import atexit
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger('frame_scheduler')
+
+FRAME_RATE = 60
+
+
+class FrameScheduler(object):
+    '''coalesce display refreshes of all terminals into frames
+
+    a terminal registers itself as a source with a producer, changes to its
+    screen only call mark_dirty. the frame thread calls the producer of
+    every marked source at most once every interval seconds, the producer
+    returns the rows changed since its last frame and the subscribers of
+    the source are called with them. marks coming while a frame is pending
+    are merged into it, so a flood of output drops the frames in between
+    like jump scroll and the reader never waits for the display.
+
+    an interval of 0 emits a frame on the next tick of the frame thread
+    without waiting, never in the thread calling mark_dirty
+    '''
+    def __init__(self, interval = 1.0 / FRAME_RATE):
+        super(FrameScheduler, self).__init__()
+
+        self._interval = max(interval, 0)
+        self._producers = {}
+        self._subscribers = {}
+        self._damaged = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self._last_frame = 0
+
+        self.frame_count = 0
+        self.merged_count = 0
+
+    def register(self, source, produce):
+        with self._cond:
+            self._producers[source] = produce
+
+    def unregister(self, source):
+        with self._cond:
+            self._producers.pop(source, None)
+            self._subscribers.pop(source, None)
+            self._damaged.discard(source)
+
+    def subscribe(self, source, callback):
+        with self._cond:
+            self._subscribers.setdefault(source, []).append(callback)
+
+    def unsubscribe(self, source, callback):
+        with self._cond:
+            callbacks = self._subscribers.get(source, [])
+
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def mark_dirty(self, source):
+        with self._cond:
+            if self._closed:
+                return
+
+            if source in self._damaged:
+                self.merged_count += 1
+                return
+
+            self._damaged.add(source)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='frame_scheduler')
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._damaged and not self._closed:
+                    self._cond.wait()
+
+                if self._closed:
+                    return
+
+            delay = self._last_frame + self._interval - time.time()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            #marks from here on go to the next frame
+            with self._cond:
+                damaged, self._damaged = self._damaged, set()
+                frames = [(self._producers[source], self._subscribers.get(source, [])[:])
+                          for source in damaged if source in self._producers]
+
+            self._last_frame = time.time()
+
+            for produce, callbacks in frames:
+                self._emit(produce, callbacks)
+
+    def _emit(self, produce, callbacks):
+        self.frame_count += 1
+
+        try:
+            dirty_rows = produce()
+        except:
+            LOGGER.exception('frame producer')
+            return
+
+        for callback in callbacks:
+            try:
+                callback(dirty_rows)
+            except:
+                LOGGER.exception('frame callback')
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_frame_scheduler(interval = 1.0 / FRAME_RATE):
+    '''the scheduler shared by all the terminals drawn at the same interval'''
+    with _schedulers_lock:
+        scheduler = _schedulers.get(interval)
+
+        if scheduler is None:
+            scheduler = _schedulers[interval] = FrameScheduler(interval)
+
+        return scheduler
+
+
+@atexit.register
+def close_frame_schedulers():
+    #the frame threads are shared, no terminal closes them
+    with _schedulers_lock:
+        schedulers = _schedulers.values()
+        _schedulers.clear()
+
+    for scheduler in schedulers:
+        scheduler.close()
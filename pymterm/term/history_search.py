@@ -0,0 +1,158 @@
+import re
+import zlib
+
+from collections import deque
+
+BLOCK_LINES = 256
+COMPRESS_LEVEL = 1
+
+
+def compile_pattern(pattern, regex = False, case_sensitive = True):
+    if not regex:
+        pattern = re.escape(pattern)
+
+    return re.compile(pattern, re.UNICODE | re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+
+
+class HistoryIndex(object):
+    '''text of the history lines kept for searching
+
+    a line is added when it scrolls into history and gets the next serial,
+    the texts of every BLOCK_LINES lines are joined and compressed into a
+    block, a search runs the pattern once over the whole text of a block,
+    so a million lines cost a few thousand regex runs. only the blocks of
+    the last max_lines lines are kept, the lines spilled to disk before
+    them are not searched
+    '''
+    def __init__(self, block_lines = BLOCK_LINES, max_lines = None):
+        super(HistoryIndex, self).__init__()
+
+        self._block_lines = block_lines
+        self._max_lines = max_lines
+        self._blocks = deque()
+        self._open_block = []
+        self._first_serial = 0
+        self._count = 0
+
+    def get_end_serial(self):
+        return self._first_serial + self._count
+
+    def add_line(self, text):
+        self._open_block.append(text)
+        self._count += 1
+
+        if len(self._open_block) == self._block_lines:
+            self._blocks.append(zlib.compress(u'\n'.join(self._open_block).encode('utf-8'), COMPRESS_LEVEL))
+            self._open_block = []
+
+            if self._max_lines is not None:
+                self.drop_before(self.get_end_serial() - self._max_lines)
+
+    def remove_last_line(self):
+        '''the last history line scrolled back into the screen'''
+        if self._count == 0:
+            return
+
+        if len(self._open_block) == 0:
+            self._open_block = self._get_block_text(len(self._blocks) - 1).split(u'\n')
+            self._blocks.pop()
+
+        self._open_block.pop()
+        self._count -= 1
+
+    def drop_before(self, serial):
+        '''lines before serial left the history, drop the blocks holding only them'''
+        while len(self._blocks) > 0 and self._first_serial + self._block_lines <= serial:
+            self._blocks.popleft()
+            self._first_serial += self._block_lines
+            self._count -= self._block_lines
+
+    def _get_block_text(self, block_index, tail_lines = []):
+        if block_index == len(self._blocks):
+            return u'\n'.join(self._open_block + tail_lines)
+
+        return zlib.decompress(self._blocks[block_index]).decode('utf-8')
+
+    def _get_block_matches(self, pattern, block_index, tail_lines):
+        text = self._get_block_text(block_index, tail_lines)
+        serial = self._first_serial + block_index * self._block_lines
+
+        #line number and position of the last match, the matches come in order
+        last = [0, 0]
+
+        def get_match(m):
+            last[0] += text.count(u'\n', last[1], m.start())
+            last[1] = m.start()
+            line_begin = text.rfind(u'\n', 0, m.start()) + 1
+
+            return (serial + last[0], m.start() - line_begin, m.end() - line_begin)
+
+        pos = 0
+        while pos <= len(text):
+            m = pattern.search(text, pos)
+
+            if not m:
+                break
+
+            if m.end() == m.start():
+                pos = m.end() + 1
+                continue
+
+            if not u'\n' in m.group(0):
+                yield get_match(m)
+                pos = m.end()
+                continue
+
+            #the match runs over lines, search the lines it runs over one
+            #by one, a search ending at the line end finds no match past it
+            begin = m.start()
+            end = text.find(u'\n', m.end() - 1)
+            end = len(text) if end < 0 else end
+
+            while True:
+                line_end = text.find(u'\n', begin)
+                line_end = len(text) if line_end < 0 else line_end
+
+                for lm in pattern.finditer(text, begin, line_end):
+                    if lm.end() != lm.start():
+                        yield get_match(lm)
+
+                if line_end >= end:
+                    break
+                begin = line_end + 1
+
+            pos = end + 1
+
+    def find(self, pattern, start, backward = True, tail_lines = []):
+        '''the nearest match of pattern before or after start
+
+        start is (serial, offset), tail_lines are the texts of lines after
+        the history, the screen lines, numbered on from get_end_serial.
+        a match is (serial, begin, end), begin and end are offsets in the
+        line text, None when nothing matches
+        '''
+        if self._count + len(tail_lines) == 0:
+            return None
+
+        start_serial, start_offset = start
+        last_block = len(self._blocks)
+
+        block_index = min(max((start_serial - self._first_serial) // self._block_lines, 0), last_block)
+        blocks = range(block_index, -1, -1) if backward else range(block_index, last_block + 1)
+
+        for i in blocks:
+            found = None
+
+            for match in self._get_block_matches(pattern, i, tail_lines):
+                if backward:
+                    if match[:2] >= start:
+                        break
+                    found = match
+                elif match[:2] > start:
+                    found = match
+                    break
+
+            if found:
+                return found
+
+        return None
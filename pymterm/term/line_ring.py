@@ -0,0 +1,91 @@
+from collections import deque
+
+
+class LineRing(object):
+    '''lines of a screen buffer, history first and the screen at the end
+
+    append and removing the oldest line are O(1), an index, insert or
+    delete costs the distance to the nearer end, so work on the visible
+    rows at the end does not grow with the size of the history
+    '''
+    def __init__(self, lines = []):
+        super(LineRing, self).__init__()
+
+        self._lines = deque(lines)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            lines = self._lines
+            return [lines[i] for i in range(*index.indices(len(lines)))]
+
+        return self._lines[index]
+
+    def __setitem__(self, index, line):
+        self._lines[index] = line
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            begin, end, step = index.indices(len(self._lines))
+
+            if step != 1:
+                raise ValueError('only slices with step 1 can be deleted')
+
+            self.delete_range(begin, end - begin)
+            return
+
+        del self._lines[index]
+
+    def append(self, line):
+        self._lines.append(line)
+
+    def extend(self, lines):
+        self._lines.extend(lines)
+
+    def pop_oldest(self):
+        return self._lines.popleft()
+
+    def insert(self, index, line):
+        length = len(self._lines)
+
+        if index < 0:
+            index = max(0, index + length)
+
+        if index >= length:
+            self._lines.append(line)
+            return
+
+        # rotate takes the shorter way round the ring
+        self._lines.rotate(-index)
+        self._lines.appendleft(line)
+        self._lines.rotate(index)
+
+    def insert_range(self, index, lines):
+        length = len(self._lines)
+
+        if index < 0:
+            index = max(0, index + length)
+
+        if index >= length:
+            self._lines.extend(lines)
+            return
+
+        self._lines.rotate(-index)
+        self._lines.extendleft(reversed(lines))
+        self._lines.rotate(index)
+
+    def delete_range(self, index, count):
+        count = min(count, len(self._lines) - index)
+
+        if count <= 0:
+            return
+
+        self._lines.rotate(-index)
+        for i in range(count):
+            self._lines.popleft()
+        self._lines.rotate(index)
@@ -8,6 +8,7 @@ class Cap:
         self.flags = {}
         self.cmds = {}
         self.control_data_start_state = ControlDataState()
+        self.state_machine = None
 
 def parse_cap(cap_str):
     cap = Cap()
@@ -24,11 +25,14 @@ def parse_cap(cap_str):
         else:
             cap.flags.update({field:1})
 
+    cap.state_machine = CompiledStateMachine(cap.control_data_start_state)
+
     return cap
 
 class ControlDataParserContext:
     def __init__(self):
         self.params = []
+        self.digit_value = None
 
     def push_param(self, param):
         self.params.append(param)
@@ -53,37 +57,58 @@ class ControlDataState:
         self.digit_state = state
         return state
 
-    def handle(self, context, c):
-        if c in self.next_states:
-            return self.next_states[c]
-
-        return self.digit_state.handle(context, c) if self.digit_state else None
+class CapMatcher:
+    '''find the cap for the params in a state's cap names
 
-    def get_cap(self, params):
-        if len(params) == 0:
-            return self.cap_name[''] if '' in self.cap_name else None
-
-        str_match = ','.join([str(x) for x in params])
+    the wildcard cap names are turned into regexes once, and the result
+    for each params is memorized, so repeated sequences like \\E[0m only
+    cost a dict lookup
+    '''
+    MAX_MEMO_SIZE = 4096
 
-        if str_match in self.cap_name:
-            return self.cap_name[str_match]
+    def __init__(self, cap_name):
+        self.cap_name = cap_name
+        self.patterns = []
+        self.memo = {}
 
         for k in sorted(self.cap_name, key=lambda v: str(v.count('*')) + v):
             if k.find('*') < 0:
-                if k == str_match:
-                    return self.cap_name[k]
-                else:
-                    continue
+                continue
 
             re_str = k.replace(',**','(,[0-9]+)?')
             re_str = re_str.replace('**','([0-9]+)?')
             re_str = re_str.replace('*', '[0-9]+')
             re_str = re_str.replace('?', '*')
 
-            if re.match(re_str, str_match):
-                return self.cap_name[k]
+            self.patterns.append((re.compile(re_str), self.cap_name[k]))
+
+    def match(self, params):
+        if len(params) == 0:
+            return self.cap_name[''] if '' in self.cap_name else None
+
+        key = tuple(params)
 
-        return None
+        try:
+            return self.memo[key]
+        except KeyError:
+            pass
+
+        str_match = ','.join([str(x) for x in params])
+
+        cap = self.cap_name[str_match] if str_match in self.cap_name else None
+
+        if not cap:
+            for pattern, v in self.patterns:
+                if pattern.match(str_match):
+                    cap = v
+                    break
+
+        if len(self.memo) >= CapMatcher.MAX_MEMO_SIZE:
+            self.memo.clear()
+
+        self.memo[key] = cap
+
+        return cap
 
 
 class DigitState(ControlDataState):
@@ -91,20 +116,118 @@ class DigitState(ControlDataState):
         ControlDataState.__init__(self)
         self.digit_base = 10
         self.digits = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'A', 'B', 'C', 'D', 'E', 'F']
-        self.value = None
 
-    def handle(self, context, cc):
+    def digit_value(self, cc):
         c = cc.upper()
 
         if c in self.digits[:self.digit_base]:
-            self.value = self.value * self.digit_base + self.digits.index(c) if self.value else self.digits.index(c)
+            return self.digits.index(c)
+
+        return -1
+
+class CompiledStateMachine:
+    '''flat transition tables compiled from the ControlDataState graph
+
+    states are numbered from START, table[state][ord(c)] is None when the
+    state can not handle c, otherwise a (next_state, flush, digit) tuple:
+      next_state: the state to move to, -1 when there is none
+      flush: the pending digit value must be pushed to params first
+      digit: the digit value to accumulate into next_state, -1 for none
+    '''
+    START = 0
+
+    def __init__(self, start_state):
+        self.states = []
+        self.digit_bases = []
+        self.cap_matchers = []
+        self.table = []
+
+        self._state_ids = {}
+        self._follow_rows = {}
+
+        self._number_states(start_state)
+
+        for state in self.states:
+            self.table.append(self._compile_row(state))
+
+        self._follow_rows = None
 
-            return self
+        #bytes the start state can not handle are plain text
+        control_bytes = [i for i in range(256) if self.table[self.START][i]]
+        self.text_run_re = re.compile('[^%s]+' % ''.join(['\\x%02x' % i for i in control_bytes]))
+
+    def _number_states(self, start_state):
+        pending = [start_state]
+
+        while len(pending) > 0:
+            state = pending.pop(0)
+
+            if id(state) in self._state_ids:
+                continue
+
+            self._state_ids[id(state)] = len(self.states)
+            self.states.append(state)
+            self.digit_bases.append(state.digit_base if isinstance(state, DigitState) else 0)
+            self.cap_matchers.append(CapMatcher(state.cap_name) if len(state.cap_name) > 0 else None)
+
+            for c in sorted(state.next_states):
+                pending.append(state.next_states[c])
+
+            if state.digit_state:
+                pending.append(state.digit_state)
+
+    def state_id(self, state):
+        return self._state_ids[id(state)]
+
+    def _follow_row(self, state):
+        #the next state of each byte without a pending digit value, a byte
+        #not in next_states falls through to the digit state
+        #entry is (next_state, digit) or None
+        if id(state) in self._follow_rows:
+            return self._follow_rows[id(state)]
+
+        d_state = state.digit_state
+
+        if d_state:
+            row = self._follow_row(d_state)[:]
+            d_state_id = self.state_id(d_state)
+
+            for i in range(256):
+                d = d_state.digit_value(chr(i))
+
+                if d >= 0:
+                    row[i] = (d_state_id, d)
         else:
-            if self.value is not None:
-                context.push_param(self.value)
-                self.value = None
-            return ControlDataState.handle(self, context, cc)
+            row = [None] * 256
+
+        for c in state.next_states:
+            row[ord(c)] = (self.state_id(state.next_states[c]), -1)
+
+        self._follow_rows[id(state)] = row
+
+        return row
+
+    def _compile_row(self, state):
+        follow_row = self._follow_row(state)
+
+        if not isinstance(state, DigitState):
+            return [(t[0], False, t[1]) if t else None for t in follow_row]
+
+        row = [(t[0], True, t[1]) if t else (-1, True, -1) for t in follow_row]
+        state_id = self.state_id(state)
+
+        for i in range(256):
+            d = state.digit_value(chr(i))
+
+            if d >= 0:
+                row[i] = (state_id, False, d)
+
+        return row
+
+    def get_cap(self, state, params):
+        matcher = self.cap_matchers[state]
+
+        return matcher.match(params) if matcher else None
 
 class CapStringValue:
     def __init__(self):
@@ -339,27 +462,38 @@ if __name__ == '__main__':
     print cap.flags, cap.cmds
 
     context = ControlDataParserContext()
-
-    state = cap1.control_data_start_state
-    next_state = None
+    machine = cap1.state_machine
 
     def try_parse(v):
-        state = cap1.control_data_start_state
-        next_state = None
+        state = machine.START
         context.params = []
+        context.digit_value = None
 
         for c in v:
-            next_state = state.handle(context, c)
+            transition = machine.table[state][ord(c)]
 
-            if not next_state or state.get_cap(context.params):
+            if not transition or machine.get_cap(state, context.params):
                 break
 
-            print 'next state:', c, next_state.next_states
+            next_state, flush, digit = transition
+
+            if flush and context.digit_value is not None:
+                context.push_param(context.digit_value)
+                context.digit_value = None
+
+            if next_state < 0:
+                break
+
+            if digit >= 0:
+                base = machine.digit_bases[next_state]
+                context.digit_value = context.digit_value * base + digit if context.digit_value else digit
+
+            print 'next state:', c, machine.states[next_state].next_states
             state = next_state
 
-        print state.cap_name, context.params
+        print machine.states[state].cap_name, context.params
 
-        print 'matched cap:', state.get_cap(context.params), state.next_states
+        print 'matched cap:', machine.get_cap(state, context.params), machine.states[state].next_states
 
 #    try_parse('\x1B[10;15H')
 #    try_parse('\x1B[1;2H')
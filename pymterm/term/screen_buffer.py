@@ -1,18 +1,36 @@
 import logging
+import re
 
-from term import reserve
-from term import Line, Cell
-from term import TextMode
+from term import Line, Cell, create_blank_lines
+from term.line_ring import LineRing
+from term.cold_history import ColdHistory
+from term.disk_history import DiskHistory
+from term.history_search import HistoryIndex, compile_pattern
 
 LOGGER = logging.getLogger('screen_buffer')
 
 
 class ScreenBuffer(object):
-    def __init__(self, max_lines=1000):
+    def __init__(self, max_lines=1000, hot_screens=3, compress=True, spill=False, spill_dir=None):
         super(ScreenBuffer, self).__init__()
 
         self._max_lines = max_lines
-        self._lines = []
+        self._lines = LineRing()
+
+        #history more than hot_screens screens above the screen is kept encoded
+        self._hot_screens = hot_screens
+        self._cold_history = ColdHistory(compress) if hot_screens > 0 else None
+        self._thawed_lines = {}
+
+        #history over max_lines goes to disk instead of being dropped
+        self._disk_history = DiskHistory(spill_dir) if spill else None
+
+        #lines get a serial when they scroll into history, dropped lines
+        #are the history lines no longer kept
+        self._history_index = HistoryIndex(max_lines = max_lines)
+        self._dropped_count = 0
+        self._search_pattern = None
+        self._search_match = None
         self._scrolling_region = None
         self._row_count = 0
         self._col_count = 0
@@ -24,11 +42,14 @@ class ScreenBuffer(object):
         self._viewing_history = False
         self._line_index_view_history = 0
 
-        self._selected_lines = []
-        
-        self._cursor_cell = None
+        #(serial, col) of the first and after the last selected cell
+        self._selection = None
+
+        #the visible lines, rebuilt after the lines or the view change
+        self._visible_lines = None
 
     def resize_buffer(self, row_count, col_count):
+        self._visible_lines = None
         self._row_count, self._col_count = row_count, col_count
         self._update_buffer_data()
 
@@ -37,6 +58,7 @@ class ScreenBuffer(object):
             if self._scrolling_region else (0, self._row_count - 1)
 
     def set_scrolling_region(self, scrolling_region):
+        self._visible_lines = None
         # reset old scrolling region
         if self._scrolling_region:
             begin, end = self._scrolling_region
@@ -65,6 +87,7 @@ class ScreenBuffer(object):
         self._update_buffer_data()
 
     def scroll_up(self, count=1):
+        self._visible_lines = None
         for i in range(count):
             if self._scrolling_region:
                 begin, end = self._scrolling_region
@@ -83,11 +106,15 @@ class ScreenBuffer(object):
                     self._line_index_fix_after_scrolling_region += 1
                     self._line_index_scrolling_region += 1
             else:
+                index = self._line_index_fix_before_scrolling_region
+                self._history_index.add_line(self._lines[index].get_text()
+                                             if index < len(self._lines) else u'')
                 self._line_index_fix_before_scrolling_region += 1
 
         self._update_buffer_data()
 
     def scroll_down(self, count = 1):
+        self._visible_lines = None
         for i in range(count):
             if self._scrolling_region:
                 begin, end = self._scrolling_region
@@ -107,6 +134,7 @@ class ScreenBuffer(object):
             else:
                 if self._line_index_fix_before_scrolling_region > 0:
                     self._line_index_fix_before_scrolling_region -= 1
+                    self._history_index.remove_last_line()
                 else:
                     self._lines.insert(0, Line())
                     self._line_index_fix_after_scrolling_region += 1
@@ -121,16 +149,35 @@ class ScreenBuffer(object):
             begin, end = self._scrolling_region
             min_buffer_size = self._line_index_fix_after_scrolling_region + self._row_count - end - 1
 
-        reserve(self._lines, min_buffer_size, Line())
+        if min_buffer_size > len(self._lines):
+            self._visible_lines = None
+            self._lines.extend(create_blank_lines(min_buffer_size - len(self._lines)))
+
+        self._freeze_history()
 
         #fix the buffer to max size
-        if len(self._lines) > self._max_lines:
-            delta = len(self._lines) - self._max_lines
+        if len(self._lines) + self._get_cold_count() > self._max_lines:
+            delta = len(self._lines) + self._get_cold_count() - self._max_lines
+            self._visible_lines = None
 
             for i in range(delta):
+                #remove cold history first
+                if self._get_cold_count() > 0:
+                    data = self._cold_history.pop_oldest()
+
+                    if self._disk_history is not None:
+                        self._disk_history.append(data)
+                    else:
+                        self._thawed_lines = {}
+                        self._drop_history_line()
                 #remove lines before fixed line first
-                if self._line_index_fix_before_scrolling_region > 0:
-                    del self._lines[0]
+                elif self._line_index_fix_before_scrolling_region > 0:
+                    line = self._lines.pop_oldest()
+
+                    if self._disk_history is not None:
+                        self._disk_history.append(line.encode())
+                    else:
+                        self._drop_history_line()
                     self._line_index_fix_before_scrolling_region -= 1
                     self._line_index_fix_after_scrolling_region -= 1
                     self._line_index_scrolling_region -= 1
@@ -152,23 +199,97 @@ class ScreenBuffer(object):
                                   < len(self._lines)):
                             #remove lines after fixed lines
                             del self._lines[self._line_index_fix_after_scrolling_region + self._row_count - end - 1]
+                        else:
+                            #only the screen is left
+                            break
                     elif  (self._line_index_fix_before_scrolling_region + self._row_count < len(self._lines)):
                         #remove lines after fixed lines
                         del self._lines[self._line_index_fix_before_scrolling_region + self._row_count]
+                    else:
+                        #only the screen is left
+                        break
+
+    def _get_cold_count(self):
+        return len(self._cold_history) if self._cold_history is not None else 0
+
+    def _get_spilled_count(self):
+        return len(self._disk_history) if self._disk_history is not None else 0
+
+    def _drop_history_line(self):
+        self._dropped_count += 1
+        self._history_index.drop_before(self._dropped_count)
+
+    def _freeze_history(self):
+        if self._cold_history is None:
+            return
+
+        hot_lines = self._hot_screens * self._row_count
+
+        while self._line_index_fix_before_scrolling_region > hot_lines:
+            self._cold_history.append(self._lines.pop_oldest())
+            self._line_index_fix_before_scrolling_region -= 1
+            self._line_index_fix_after_scrolling_region -= 1
+            self._line_index_scrolling_region -= 1
+
+    def _get_history_lines(self, begin, end):
+        #index counts the lines on disk first, then the cold history, then the lines
+        spilled_count = self._get_spilled_count()
+        frozen_count = spilled_count + self._get_cold_count()
+
+        lines = self._lines[max(begin - frozen_count, 0):max(end - frozen_count, 0)]
+
+        if begin >= frozen_count:
+            return lines
+
+        #decode the lines in view, keep them while they stay in view
+        thawed = {}
+        for i in range(begin, min(end, frozen_count)):
+            if i in self._thawed_lines:
+                thawed[i] = self._thawed_lines[i]
+            elif i < spilled_count:
+                thawed[i] = self._disk_history.get_line(i)
+            else:
+                thawed[i] = self._cold_history.get_line(i - spilled_count)
+        self._thawed_lines = thawed
+
+        return [thawed[i] for i in range(begin, min(end, frozen_count))] + lines
+
+    def close(self):
+        '''remove the history on disk'''
+        if self._disk_history is None:
+            return
+
+        self._visible_lines = None
+
+        spilled_count = self._get_spilled_count()
+        self._disk_history.close()
+
+        self._thawed_lines = {}
+        self._line_index_view_history = max(self._line_index_view_history - spilled_count, 0)
 
     def get_line(self, row):
-        lines = self.get_visible_lines()
+        lines = self._visible_lines if self._visible_lines is not None \
+            else self.get_visible_lines()
 
         if row >= len(lines):
             LOGGER.error('get line out of range:{}, {}'.format(row, len(lines)))
         return lines[row]
 
     def get_visible_lines(self):
+        if self._visible_lines is not None:
+            return self._visible_lines
+
         self._update_buffer_data()
 
         if self._viewing_history:
-            return self._lines[self._line_index_view_history : self._line_index_view_history + self._row_count]
+            self._visible_lines = self._get_history_lines(self._line_index_view_history,
+                                                          self._line_index_view_history + self._row_count)
+        else:
+            self._visible_lines = self._get_screen_lines()
 
+        return self._visible_lines
+
+    def _get_screen_lines(self):
         if self._scrolling_region:
             begin, end = self._scrolling_region
 
@@ -178,7 +299,183 @@ class ScreenBuffer(object):
         else:
             return self._lines[self._line_index_fix_before_scrolling_region : self._line_index_fix_before_scrolling_region + self._row_count]
 
+    def search(self, pattern, regex = False, case_sensitive = True):
+        '''search history and screen from the bottom up for pattern'''
+        try:
+            self._search_pattern = compile_pattern(pattern, regex, case_sensitive)
+        except re.error:
+            LOGGER.warning('invalid search pattern:{}'.format(pattern))
+            self.clear_search()
+            return False
+
+        self._search_match = None
+
+        return self.search_next()
+
+    def search_next(self):
+        '''the match above the current one'''
+        return self._search(True)
+
+    def search_previous(self):
+        '''the match below the current one'''
+        return self._search(False)
+
+    def _search(self, backward):
+        if not self._search_pattern:
+            return False
+
+        self._update_buffer_data()
+
+        screen_texts = [line.get_text() for line in self._get_screen_lines()]
+        end_serial = self._history_index.get_end_serial()
+
+        if self._search_match:
+            start = self._search_match[:2]
+        else:
+            start = (end_serial + len(screen_texts), 0) if backward else (self._dropped_count, -1)
+
+        match = self._history_index.find(self._search_pattern,
+                                         max(start, (self._dropped_count, -1)),
+                                         backward,
+                                         screen_texts)
+
+        if not match or match[0] < self._dropped_count:
+            return False
+
+        self._search_match = match
+        self._show_search_match(end_serial)
+
+        return True
+
+    def _show_search_match(self, end_serial):
+        serial = self._search_match[0]
+
+        if serial >= end_serial:
+            #the match is on the screen
+            self.view_history(False)
+            return
+
+        index = self._get_serial_index(serial)
+
+        if not self._viewing_history:
+            self.view_history(True)
+
+        if index < self._line_index_view_history \
+                or index >= self._line_index_view_history + self._row_count:
+            self._line_index_view_history = index - self._row_count // 2
+            self._view_history_update(0)
+
+    def clear_search(self):
+        self._search_pattern = None
+        self._search_match = None
+
+    def has_search(self):
+        return self._search_pattern is not None
+
+    def get_search_highlights(self):
+        '''(row, begin col, end col) of the search match in the visible rows'''
+        if not self._search_match:
+            return []
+
+        serial, begin, end = self._search_match
+        row = self._get_index_row(self._get_serial_index(serial))
+
+        if row < 0 or row >= self._row_count:
+            return []
+
+        #offsets in the text to cells, a wide char has a '\000' cell after it
+        raw_text = self.get_visible_lines()[row].get_text(raw=True)
+        col, offset = 0, 0
+        begin_col = end_col = None
+
+        for c in raw_text:
+            if c == '\000':
+                col += 1
+                continue
+            if offset == begin:
+                begin_col = col
+            if offset == end:
+                break
+            offset += 1
+            col += 1
+
+        if begin_col is None:
+            return []
+
+        return [(row, begin_col, col)]
+
+    def _get_screen_row_index(self, row):
+        #index of the screen row counted like _get_history_lines
+        frozen_count = self._get_spilled_count() + self._get_cold_count()
+
+        if not self._scrolling_region:
+            return frozen_count + self._line_index_fix_before_scrolling_region + row
+
+        begin, end = self._scrolling_region
+
+        if row < begin:
+            return frozen_count + self._line_index_fix_before_scrolling_region + row
+        elif row <= end:
+            return frozen_count + self._line_index_scrolling_region + row - begin
+        else:
+            return frozen_count + self._line_index_fix_after_scrolling_region + row - end - 1
+
+    def _get_index_screen_row(self, index):
+        #the lines scrolled out of the scrolling region are kept between the
+        #screen rows, they and the history lines have no screen row
+        index -= self._get_spilled_count() + self._get_cold_count()
+        row = index - self._line_index_fix_before_scrolling_region
+
+        if not self._scrolling_region:
+            return row if 0 <= row < self._row_count else -1
+
+        begin, end = self._scrolling_region
+
+        if 0 <= row < begin:
+            return row
+
+        row = index - self._line_index_scrolling_region + begin
+
+        if begin <= row <= end:
+            return row
+
+        row = index - self._line_index_fix_after_scrolling_region + end + 1
+
+        if end < row < self._row_count:
+            return row
+
+        return -1
+
+    def _get_row_index(self, row):
+        if self._viewing_history:
+            return self._line_index_view_history + row
+
+        return self._get_screen_row_index(row)
+
+    def _get_index_row(self, index):
+        if self._viewing_history:
+            return index - self._line_index_view_history
+
+        return self._get_index_screen_row(index)
+
+    def _get_serial_index(self, serial):
+        #serials count the history lines then the screen rows, the lines
+        #scrolled out of the scrolling region have none
+        end_serial = self._history_index.get_end_serial()
+
+        if serial >= end_serial:
+            return self._get_screen_row_index(serial - end_serial)
+
+        return serial - self._dropped_count
+
+    def fill_lines(self, begin_row, end_row, cols, attr_id):
+        '''blank the visible rows from begin_row to end_row, cols cells each'''
+        for line in self.get_visible_lines()[begin_row:end_row]:
+            line.alloc_cells(cols, True)
+            line.fill_cells(0, -1, attr_id)
+
     def delete_lines(self, start, count):
+        self._visible_lines = None
         if start < 0 or start >= self._row_count:
             LOGGER.warning('delete lines, start:{} out of range:({}, {})'.format(start, 0, self._row_count))
             return
@@ -197,17 +494,23 @@ class ScreenBuffer(object):
                 LOGGER.warning('delete lines, start:{} out of range:({}, {})'.format(start, begin, end))
                 return
 
-            begin = self._line_index_scrolling_region
             end += self._line_index_scrolling_region - begin
+            begin = self._line_index_scrolling_region
             end += 1
             start_row = self._line_index_scrolling_region
             start_row += start - self._scrolling_region[0]
 
-        for i in range(count):
-            self._lines.insert(end, Line())
-            del self._lines[start_row]
+        #the lines below move up in one step, blank lines fill the bottom
+        count = min(count, end - start_row)
+
+        if count <= 0:
+            return
+
+        self._lines.delete_range(start_row, count)
+        self._lines.insert_range(end - count, create_blank_lines(count))
 
     def insert_lines(self, start, count):
+        self._visible_lines = None
         if start < 0 or start >= self._row_count:
             LOGGER.warning('insert lines, start:{} out of range:({}, {})'.format(start, 0, self._row_count))
             return
@@ -226,17 +529,24 @@ class ScreenBuffer(object):
                 LOGGER.warning('insert lines, start:{} out of range:({}, {})'.format(start, begin, end))
                 return
 
-            begin = self._line_index_scrolling_region
             end += self._line_index_scrolling_region - begin
+            begin = self._line_index_scrolling_region
             start_row = self._line_index_scrolling_region
             start_row += start - self._scrolling_region[0]
 
-        for i in range(count):
-            del self._lines[end]
-            self._lines.insert(start_row, Line())
+        #the lines move down in one step, the bottom ones drop out
+        count = min(count, end - start_row + 1)
+
+        if count <= 0:
+            return
+
+        self._lines.delete_range(end - count + 1, count)
+        self._lines.insert_range(start_row, create_blank_lines(count))
 
     def view_history(self, view_history):
+        self._visible_lines = None
         self._viewing_history = view_history
+        self._thawed_lines = {}
 
         if view_history:
             if self._scrolling_region:
@@ -245,6 +555,8 @@ class ScreenBuffer(object):
             else:
                 self._line_index_view_history = self._line_index_fix_before_scrolling_region
 
+            self._line_index_view_history += self._get_spilled_count() + self._get_cold_count()
+
     def is_view_history(self):
         return self._viewing_history
 
@@ -261,52 +573,93 @@ class ScreenBuffer(object):
         self._view_history_update(1)
 
     def _view_history_update(self, delta):
+        self._visible_lines = None
         self._line_index_view_history += delta
 
         if self._line_index_view_history < 0:
             self._line_index_view_history = 0
 
-        if self._line_index_view_history > len(self._lines) - self._row_count:
-            self._line_index_view_history = len(self._lines) - self._row_count
+        history_count = len(self._lines) + self._get_spilled_count() + self._get_cold_count()
+
+        if self._line_index_view_history > history_count - self._row_count:
+            self._line_index_view_history = history_count - self._row_count
 
     def set_selection(self, s_from, s_to):
+        '''select from s_from to s_to, both (col, row) of the visible rows
+
+        the selection is kept as a range of the buffer lines, numbered from
+        the first line ever added to the history, the cells are not touched,
+        so it moves with the lines when they scroll
+        '''
         self.clear_selection()
 
         if s_from == s_to:
             return
 
+        self._update_buffer_data()
+
         s_f_col, s_f_row = s_from
         s_t_col, s_t_row = s_to
 
-        lines = self.get_visible_lines()
+        begin = (self._dropped_count + self._get_row_index(s_f_row), s_f_col)
+        end = (self._dropped_count + self._get_row_index(s_t_row), s_t_col)
 
-        for i in range(s_f_row, s_t_row + 1):
-            line = lines[i]
-            line.select_cells(s_f_col if i == s_f_row else 0,
-                              s_t_col if i == s_t_row else self._col_count)
-            self._selected_lines.append(line)
+        self._selection = (min(begin, end), max(begin, end))
 
     def clear_selection(self):
-        for line in self._selected_lines:
-            line.clear_selection()
+        self._selection = None
+
+    def get_selection_highlights(self):
+        '''(row, begin col, end col) of the selection in the visible rows'''
+        if not self._selection:
+            return []
+
+        (b_line, b_col), (e_line, e_col) = self._selection
+
+        highlights = []
+
+        for row in range(self._row_count):
+            line = self._dropped_count + self._get_row_index(row)
+
+            if line < b_line or line > e_line:
+                continue
+
+            highlights.append((row,
+                               b_col if line == b_line else 0,
+                               e_col if line == e_line else self._col_count))
 
-        self._selected_lines = []
+        return highlights
 
     def get_selection_text(self):
-        return self._selected_lines
+        '''texts of the selected part of each line, dropped lines are skipped
 
-    def has_selection(self):
-        return len(self._selected_lines) > 0
+        the lines scrolled out of the scrolling region are skipped too unless
+        the history is viewed, they are not shown between the screen rows
+        '''
+        if not self._selection:
+            return []
+
+        self._update_buffer_data()
 
-    def set_cursor(self, cursor):
-        if self._cursor_cell:
-            self._cursor_cell.get_attr().unset_mode(TextMode.CURSOR)
+        (b_line, b_col), (e_line, e_col) = self._selection
+        begin = max(b_line, self._dropped_count)
+        screen_index = self._get_screen_row_index(0)
+        texts = []
 
-        if cursor:
-            col, row = cursor
+        for line, l in enumerate(self._get_history_lines(begin - self._dropped_count,
+                                                         e_line - self._dropped_count + 1),
+                                 begin):
+            index = line - self._dropped_count
 
-            line = self.get_line(row)
+            if not self._viewing_history and index >= screen_index \
+                    and self._get_index_screen_row(index) < 0:
+                continue
 
-            cell = line.get_cell(col)
-            cell.get_attr().set_mode(TextMode.CURSOR)
-            self._cursor_cell = cell
+            texts.append(l.get_text(b_col if line == b_line else 0,
+                                    e_col if line == e_line else -1))
+
+        return texts
+
+    def has_selection(self):
+        #the selected lines may all be dropped from history
+        return self._selection is not None and self._selection[1][0] >= self._dropped_count
@@ -0,0 +1,69 @@
+from collections import namedtuple
+
+ScreenSnapshot = namedtuple('ScreenSnapshot',
+                            ['lines', 'cursor', 'cursor_visible', 'dirty_rows',
+                             'search_highlights', 'selection_highlights'])
+
+
+class SnapshotPublisher(object):
+    '''hands the visible screen from the parser to the renderer
+
+    publish is called once a frame with the lock of the screen buffer held,
+    so the publishes never overlap and each sees a later screen than the
+    one before. it freezes every visible line into a copy keeping the line
+    revision, a line whose revision did not change since the last publish
+    reuses its frozen copy, so unchanged rows are shared between snapshots
+    and never copied again. the snapshot is a new immutable object swapped
+    in by one assignment, consume just takes the latest one without a lock.
+    publish returns the rows whose frozen line is not the one of the
+    snapshot published before.
+
+    dirty_rows of a consumed snapshot are the rows whose frozen line is not
+    the one of the snapshot consumed before
+    '''
+    def __init__(self):
+        super(SnapshotPublisher, self).__init__()
+
+        self._frozen_lines = {}
+        self._snapshot = None
+        self._consumed_snapshot = None
+
+    def publish(self, lines, cursor, cursor_visible, search_highlights, selection_highlights):
+        frozen_lines = {}
+        rows = []
+
+        for line in lines:
+            entry = self._frozen_lines.get(id(line))
+
+            #the line is kept in the entry, so its id is not reused
+            if entry is None or entry[0] is not line or entry[1] != line.get_revision():
+                entry = (line, line.get_revision(), line.freeze())
+
+            frozen_lines[id(line)] = entry
+            rows.append(entry[2])
+
+        last_rows = self._snapshot.lines if self._snapshot is not None else ()
+
+        self._frozen_lines = frozen_lines
+        self._snapshot = ScreenSnapshot(tuple(rows), cursor, cursor_visible, frozenset(),
+                                        tuple(search_highlights), tuple(selection_highlights))
+
+        return frozenset([i for i in range(len(rows))
+                          if i >= len(last_rows) or rows[i] is not last_rows[i]])
+
+    def has_snapshot(self):
+        return self._snapshot is not None
+
+    def consume(self):
+        snapshot = self._snapshot
+        last = self._consumed_snapshot
+        self._consumed_snapshot = snapshot
+
+        if snapshot is None:
+            return None
+
+        rows = snapshot.lines
+        last_rows = last.lines if last is not None else ()
+
+        return snapshot._replace(dirty_rows=frozenset(
+            [i for i in range(len(rows)) if i >= len(last_rows) or rows[i] is not last_rows[i]]))
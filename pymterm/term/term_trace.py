@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+
+from collections import deque, defaultdict
+
+LOGGER = logging.getLogger('term_trace')
+
+TRACED_METHODS = ['on_data', 'on_control_data', 'output_data', 'output_text_run',
+                  'publish_snapshot', 'lock_display_data_exec']
+
+
+class TermTrace(object):
+    '''parser and screen statistics of a terminal
+
+    tracing wraps the terminal methods on the instance when enabled, so a
+    terminal without tracing runs the plain class methods and pays nothing.
+    the frames are timed where they cost, publishing the snapshot on the
+    frame thread and drawing it in the renderer, and the stats are dumped
+    every dump_interval seconds from a timer thread, also when idle
+    '''
+    def __init__(self, ring_size = 256, dump_interval = 60):
+        self.bytes_parsed = 0
+        self.parse_time = 0.0
+        self.buffer_time = 0.0
+        self.publish_time = 0.0
+        self.draw_time = 0.0
+        self.frame_count = 0
+        self.unknown_count = 0
+        self.cap_counts = defaultdict(int)
+        self.last_sequences = deque(maxlen = ring_size)
+        self.dump_interval = dump_interval
+
+        self._buffer_depth = 0
+        self._dump_stopped = threading.Event()
+        self._dump_thread = None
+
+    def add_sequence(self, cap_name, params, control_data):
+        self.last_sequences.append((time.time(), cap_name, params[:], ''.join(control_data)))
+
+    def add_unknown(self, params, control_data):
+        self.unknown_count += 1
+        self.add_sequence(None, params, control_data)
+
+    def get_stats(self):
+        return {'bytes_parsed': self.bytes_parsed,
+                'parse_time': self.parse_time,
+                'buffer_time': self.buffer_time,
+                'publish_time': self.publish_time,
+                'draw_time': self.draw_time,
+                'frame_count': self.frame_count,
+                'unknown_count': self.unknown_count,
+                'last_sequences': list(self.last_sequences)}
+
+    def start_dump(self):
+        if self.dump_interval <= 0 or self._dump_thread:
+            return
+
+        self._dump_thread = threading.Thread(target=self._run_dump, name='term_trace_dump')
+        self._dump_thread.daemon = True
+        self._dump_thread.start()
+
+    def stop_dump(self):
+        self._dump_stopped.set()
+
+    def _run_dump(self):
+        while not self._dump_stopped.wait(self.dump_interval):
+            try:
+                self.dump()
+            except:
+                LOGGER.exception('dump trace')
+
+    def dump(self):
+        cap_counts = sorted(self.cap_counts.items(), key=lambda x: -x[1])
+
+        LOGGER.info('bytes={} parse={:.3f}s buffer={:.3f}s publish={:.3f}s/{} draw={:.3f}s unknown={} caps={}'.format(
+            self.bytes_parsed, self.parse_time, self.buffer_time,
+            self.publish_time, self.frame_count, self.draw_time,
+            self.unknown_count, cap_counts[:20]))
+
+        for t, cap_name, params, control_data in self.last_sequences:
+            LOGGER.info('{:.3f} {} {} [[[{}]]]'.format(t, cap_name, params, control_data))
+
+
+def install(term, trace):
+    on_data = term.on_data
+    on_control_data = term.on_control_data
+    output_data = term.output_data
+    output_text_run = term.output_text_run
+    publish_snapshot = getattr(term, 'publish_snapshot', None)
+    lock_display_data_exec = getattr(term, 'lock_display_data_exec', None)
+
+    def timed_buffer(func, arg):
+        #nested buffer changes are counted by the outer one
+        if trace._buffer_depth > 0:
+            return func(arg)
+
+        trace._buffer_depth += 1
+        begin = time.time()
+
+        try:
+            return func(arg)
+        finally:
+            trace._buffer_depth -= 1
+            trace.buffer_time += time.time() - begin
+
+    def traced_on_data(data):
+        begin = time.time()
+        buffer_time = trace.buffer_time
+
+        try:
+            on_data(data)
+        finally:
+            trace.bytes_parsed += len(data)
+            trace.parse_time += time.time() - begin - (trace.buffer_time - buffer_time)
+
+    def traced_on_control_data(cap_turple):
+        trace.cap_counts[cap_turple[0]] += 1
+        trace.add_sequence(cap_turple[0], term.context.params, term.control_data)
+
+        timed_buffer(on_control_data, cap_turple)
+
+    def traced_output_data(c):
+        timed_buffer(output_data, c)
+
+    def traced_output_text_run(data):
+        timed_buffer(output_text_run, data)
+
+    def traced_publish_snapshot():
+        begin = time.time()
+
+        try:
+            return publish_snapshot()
+        finally:
+            trace.frame_count += 1
+            trace.publish_time += time.time() - begin
+
+    def traced_lock_display_data_exec(func):
+        def timed_draw():
+            begin = time.time()
+
+            try:
+                func()
+            finally:
+                trace.draw_time += time.time() - begin
+
+        lock_display_data_exec(timed_draw)
+
+    term.on_data = traced_on_data
+    term.on_control_data = traced_on_control_data
+    term.output_data = traced_output_data
+    term.output_text_run = traced_output_text_run
+
+    if publish_snapshot:
+        term.publish_snapshot = traced_publish_snapshot
+
+    if lock_display_data_exec:
+        term.lock_display_data_exec = traced_lock_display_data_exec
+
+    trace.start_dump()
+
+def uninstall(term, trace):
+    trace.stop_dump()
+
+    for name in TRACED_METHODS:
+        term.__dict__.pop(name, None)
@@ -0,0 +1,89 @@
+import cPickle
+import hashlib
+import logging
+import os
+
+LOGGER = logging.getLogger('termcap_cache')
+
+CACHE_VERSION = 2
+CACHE_FILE_EXT = '.capcache'
+
+def get_cache_dir():
+    try:
+        import appdirs
+        return appdirs.user_cache_dir('pymterm')
+    except ImportError:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'pymterm')
+
+def get_cache_path(term_path, term_name):
+    '''the cache file of the term data file in the user cache dir
+
+    None when the cache dir can not be written, the term cap is parsed
+    without a cache then
+    '''
+    cache_dir = get_cache_dir()
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+    except OSError:
+        return None
+
+    if not os.access(cache_dir, os.W_OK):
+        return None
+
+    #term data files of the same name in different dirs get their own cache
+    path_hash = hashlib.md5(os.path.realpath(term_path)).hexdigest()[:8]
+
+    return os.path.join(cache_dir, '{}-{}{}'.format(term_name, path_hash, CACHE_FILE_EXT))
+
+def get_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def get_sources_stamp(paths):
+    return [(p, get_mtime(p)) for p in paths]
+
+def load(cache_path, key):
+    '''load the (cap_str, cap) saved for key
+
+    key identifies the requested term data files, the cache is only
+    used when every data file read to build it is unchanged
+    '''
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, 'rb') as f:
+            version, cached_key, sources_stamp, cap_str, cap = cPickle.load(f)
+    except:
+        LOGGER.warning('unable to load term cap cache:{}'.format(cache_path))
+        return None
+
+    if version != CACHE_VERSION or cached_key != key:
+        return None
+
+    if sources_stamp != get_sources_stamp([p for p, mtime in sources_stamp]):
+        LOGGER.info('term cap cache is out of date:{}'.format(cache_path))
+        return None
+
+    return cap_str, cap
+
+def save(cache_path, key, source_paths, cap_str, cap):
+    tmp_path = '{}.{}'.format(cache_path, os.getpid())
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            cPickle.dump((CACHE_VERSION, key, get_sources_stamp(source_paths), cap_str, cap),
+                         f, cPickle.HIGHEST_PROTOCOL)
+
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        os.rename(tmp_path, cache_path)
+    except:
+        LOGGER.warning('unable to save term cap cache:{}'.format(cache_path))
+
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,41 +1,99 @@
 import logging
 import os
+import threading
 
 import cap.cap_manager
 import parse_termdata
 import read_termdata
+import term_trace
+import termcap_cache
 
 from collections import deque
 
+# parsed caps are read only, all terminals of the same term data share one
+_shared_caps = {}
+_shared_caps_lock = threading.Lock()
+
 class Terminal(object):
     def __init__(self, cfg):
         self.cfg = cfg
 
-        self.cap_str = self.__load_cap_str__('generic-cap')
-        try:
-            self.cap_str += self.__load_cap_str__(self.cfg.term_name)
-        except:
-            logging.exception('unable to load term data:%s' % self.cfg.term_name)
-            self.cap_str += self.__load_cap_str__('xterm-256color')
-
-        self.cap = parse_termdata.parse_cap(self.cap_str)
+        self.cap_str, self.cap = self.__load_cap__()
+        self.cap_handlers = cap.cap_manager.get_cap_handlers(self, self.cap.cmds)
         self.context = parse_termdata.ControlDataParserContext()
-        self.state = self.cap.control_data_start_state
+        self.state_machine = self.cap.state_machine
+        self.state = self.state_machine.START
         self.control_data = []
         self.in_status_line = False
         self.keypad_transmit_mode = False
         self._cap_state_stack = deque()
+        self._trace = None
+
+        if self.cfg.config and 'trace-config' in self.cfg.config:
+            trace_config = self.cfg.config['trace-config']
+
+            if trace_config.get('enabled', False):
+                self.enable_trace(trace_config.get('ring_size', 256),
+                                  trace_config.get('dump_interval', 60))
 
         logging.getLogger('terminal').debug('cap-str:{}, cap:{}, self={}'.format(self.cap_str, self.cap, self))
 
-    def __load_cap_str__(self, term_name):
+    def __load_cap__(self):
+        term_names = ['generic-cap', self.cfg.term_name]
+        #the same data files reached by other paths share the cap and cache
+        term_paths = [os.path.realpath(self.__get_term_path__(term_name)) for term_name in term_names]
+
+        key = zip(term_names, term_paths)
+
+        with _shared_caps_lock:
+            shared_key = tuple(key)
+
+            if not shared_key in _shared_caps:
+                _shared_caps[shared_key] = self.__load_shared_cap__(key, term_paths)
+
+            return _shared_caps[shared_key]
+
+    def __load_shared_cap__(self, key, term_paths):
+        cache_path = termcap_cache.get_cache_path(term_paths[-1], self.cfg.term_name)
+
+        cached = termcap_cache.load(cache_path, key) if cache_path else None
+
+        if cached:
+            logging.getLogger('terminal').info('load term cap from cache:{}'.format(cache_path))
+            return cached
+
+        source_paths = list(term_paths)
+
+        cap_str = self.__load_cap_str__('generic-cap')
+        try:
+            cap_str += self.__load_cap_str__(self.cfg.term_name)
+        except:
+            logging.exception('unable to load term data:%s' % self.cfg.term_name)
+            cap_str += self.__load_cap_str__('xterm-256color')
+            source_paths.append(os.path.realpath(self.__get_term_path__('xterm-256color')))
+
+        cap = parse_termdata.parse_cap(cap_str)
+
+        if cache_path:
+            termcap_cache.save(cache_path, key, source_paths, cap_str, cap)
+
+        return cap_str, cap
+
+    def __get_term_path__(self, term_name):
+        term_path = None
+
         if 'termcap_dir' in self.cfg.config:
             term_path = os.path.join(self.cfg.config['termcap_dir'], term_name+'.dat')
 
-        if not os.path.exists(term_path):
+        if not term_path or not os.path.exists(term_path):
             term_path = os.path.dirname(os.path.realpath(__file__))
             term_path = os.path.join(term_path, '..', '..', 'data', term_name+'.dat')
 
+        return term_path
+
+    def __load_cap_str__(self, term_name):
+        term_path = self.__get_term_path__(term_name)
+
         logging.getLogger('terminal').info('load term cap data file:{}'.format(term_path))
 
         return read_termdata.get_entry(term_path, term_name)
@@ -45,13 +103,47 @@ class Terminal(object):
 
     def on_control_data(self, cap_turple):
         cap_name, increase_params = cap_turple
-        cap_handler = cap.cap_manager.get_cap_handler(cap_name)
 
-        logging.getLogger('terminal').debug("control data:[[[" + ''.join(self.control_data) + ']]],for cap:' + cap_name)
-        if not cap_handler:
-            logging.getLogger('terminal').error('no matched:{}, params={}'.format(cap_turple, self.context.params))
-        elif cap_handler:
-            cap_handler.handle(self, self.context, cap_turple)
+        if self.cfg.debug:
+            logging.getLogger('terminal').debug("control data:[[[" + ''.join(self.control_data) + ']]],for cap:' + cap_name)
+
+        try:
+            cap_handler = self.cap_handlers[cap_name]
+        except KeyError:
+            cap_handler = self.cap_handlers[cap_name] = cap.cap_manager.get_term_cap_handler(self, cap_name)
+
+        cap_handler(self.context, cap_turple)
+
+    def get_cap_fire_counts(self):
+        #the caps are only counted while tracing
+        if not self._trace:
+            return {}
+
+        return dict(self._trace.cap_counts)
+
+    def enable_trace(self, ring_size = 256, dump_interval = 60):
+        self.disable_trace()
+
+        self._trace = term_trace.TermTrace(ring_size, dump_interval)
+        term_trace.install(self, self._trace)
+
+    def disable_trace(self):
+        if self._trace:
+            term_trace.uninstall(self, self._trace)
+            self._trace = None
+
+    def get_trace_stats(self):
+        if not self._trace:
+            return None
+
+        stats = self._trace.get_stats()
+        stats['cap_counts'] = self.get_cap_fire_counts()
+
+        return stats
+
+    def dump_trace(self):
+        if self._trace:
+            self._trace.dump()
 
     def output_data(self, c):
         if self.in_status_line:
@@ -59,8 +151,13 @@ class Terminal(object):
         else:
             self.output_normal_data(c)
 
+    def output_text_run(self, data):
+        for c in data:
+            self.output_data(c)
+
     def __handle_cap__(self, check_unknown = True, data = None, c = None):
-        cap_turple = self.state.get_cap(self.context.params)
+        state_machine = self.state_machine
+        cap_turple = state_machine.get_cap(self.state, self.context.params)
 
         if cap_turple:
             self.on_control_data(cap_turple)
@@ -68,25 +165,31 @@ class Terminal(object):
             if len(self._cap_state_stack) > 0:
                 self.state, self.context.params, self.control_data = self._cap_state_stack.pop()
             else:
-                self.state = self.cap.control_data_start_state
+                self.state = state_machine.START
                 self.context.params = []
                 self.control_data = []
+            self.context.digit_value = None
         elif check_unknown and len(self.control_data) > 0:
-            m1 = 'start state:{}, params={}, self={}, next_states={}'.format(self.cap.control_data_start_state.cap_name, self.context.params, self, self.cap.control_data_start_state.next_states)
-            m2 = 'current state:{}, params={}, next_states={}, {}, [{}]'.format(self.state.cap_name, self.context.params, self.state.next_states, self.state.digit_state, ord(c) if c else 'None')
-            m3 = "unknown control data:[[[" + ''.join(self.control_data) + ']]]'
-            m4 = 'data:[[[' + data.replace('\x1B', '\\E').replace('\r', '\r\n') + ']]]'
-            m5 = 'data:[[[' + ' '.join(map(str, map(ord, data))) + ']]]'
+            start_state = state_machine.states[state_machine.START]
+            cur_state = state_machine.states[self.state]
 
-            next_state = self.cap.control_data_start_state.handle(self.context, c)
+            if not state_machine.table[state_machine.START][ord(c)]:
+                m1 = 'start state:{}, params={}, self={}, next_states={}'.format(start_state.cap_name, self.context.params, self, start_state.next_states)
+                m2 = 'current state:{}, params={}, next_states={}, {}, [{}]'.format(cur_state.cap_name, self.context.params, cur_state.next_states, cur_state.digit_state, ord(c) if c else 'None')
+                m3 = "unknown control data:[[[" + ''.join(self.control_data) + ']]]'
+                m4 = 'data:[[[' + data.replace('\x1B', '\\E').replace('\r', '\r\n') + ']]]'
+                m5 = 'data:[[[' + ' '.join(map(str, map(ord, data))) + ']]]'
 
-            if not next_state:
                 logging.getLogger('terminal').error('\r\n'.join([m1, m2, m3, m4, m5, str(self.in_status_line)]))
 
+            if self._trace:
+                self._trace.add_unknown(self.context.params, self.control_data)
+
             self._cap_state_stack.append((self.state, self.context.params, self.control_data))
 
-            self.state = self.cap.control_data_start_state
+            self.state = state_machine.START
             self.context.params = []
+            self.context.digit_value = None
             self.control_data = []
 
         if not check_unknown and not cap_turple and len(self.control_data) > 0:
@@ -94,19 +197,75 @@ class Terminal(object):
 
         return cap_turple
 
+    def __next_state__(self, c):
+        #one step of the compiled state machine, the digit accumulation
+        #is folded into the transition entry
+        transition = self.state_machine.table[self.state][ord(c)]
+
+        if not transition:
+            return -1
+
+        next_state, flush, digit = transition
+        context = self.context
+
+        if flush and context.digit_value is not None:
+            context.push_param(context.digit_value)
+            context.digit_value = None
+
+        if digit >= 0:
+            base = self.state_machine.digit_bases[next_state]
+            context.digit_value = context.digit_value * base + digit if context.digit_value else digit
+
+        return next_state
+
     def __try_parse__(self, data):
-        next_state = None
+        state_machine = self.state_machine
+        table = state_machine.table
+        digit_bases = state_machine.digit_bases
+        cap_matchers = state_machine.cap_matchers
+        start = state_machine.START
+        match_text_run = state_machine.text_run_re.match
+        context = self.context
 
-        for c in data:
-            next_state = self.state.handle(self.context, c)
+        pos = 0
+        data_len = len(data)
+
+        while pos < data_len:
+            state = self.state
+
+            if state == start and cap_matchers[start] is None and len(self.control_data) == 0:
+                # nothing to finish, hand the whole plain text run over
+                m = match_text_run(data, pos)
+
+                if m:
+                    self.output_text_run(m.group())
+                    pos = m.end()
+                    continue
+
+            c = data[pos]
+            pos += 1
+
+            transition = table[state][ord(c)]
+
+            if transition:
+                next_state, flush, digit = transition
+
+                if flush and context.digit_value is not None:
+                    context.push_param(context.digit_value)
+                    context.digit_value = None
+
+                if digit >= 0:
+                    context.digit_value = context.digit_value * digit_bases[next_state] + digit if context.digit_value else digit
+            else:
+                next_state = -1
 
-            if not next_state or self.state.get_cap(self.context.params):
+            if next_state < 0 or (cap_matchers[state] and cap_matchers[state].match(context.params)):
                 cap_turple = self.__handle_cap__(data=data, c=c)
 
                 # retry last char
-                next_state = self.state.handle(self.context, c)
+                next_state = self.__next_state__(c)
 
-                if next_state:
+                if next_state >= 0:
                     self.state = next_state
                     self.control_data.append(c if not c == '\x1B' else '\\E')
                 else:
@@ -117,8 +276,7 @@ class Terminal(object):
             self.state = next_state
             self.control_data.append(c if not c == '\x1B' else '\\E')
 
-        if self.state:
-	        self.__handle_cap__(False)
+        self.__handle_cap__(False)
 
     def enter_status_line(self, mode, enter):
         self.in_status_line = enter
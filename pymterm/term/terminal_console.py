@@ -14,6 +14,9 @@ class TerminalConsole(Terminal):
             sys.exit(1)
         sys.stdout.write(c)
 
+    def insert_chars(self, count):
+        self.output_normal_data(' ' * count, True)
+
     def output_status_line_data(self, c):
         if c == '\x1b':
             sys.exit(1)
@@ -3,22 +3,53 @@ import sys
 import threading
 
 from term import TextMode
-from term import get_default_text_attribute
+from term import get_default_text_attribute, get_attr_id
 from term import DEFAULT_FG_COLOR_IDX, DEFAULT_BG_COLOR_IDX
 from term import Cell, Line
 from term_char_width import char_width
 from terminal import Terminal
 from charset_mode import translate_char, translate_char_british
 from screen_buffer import ScreenBuffer
+from frame_scheduler import get_frame_scheduler
+from screen_snapshot import SnapshotPublisher
 
 LOGGER = logging.getLogger('term_gui')
 TAB_MAX = 999
 
 
+def split_utf8_tail(data):
+    #split the incomplete utf_8 sequence at the end of data
+    for i in range(1, min(4, len(data)) + 1):
+        b = ord(data[-i])
+
+        if b & 0xC0 == 0x80:
+            #continuation byte, keep looking for the lead byte
+            continue
+
+        if b >= 0xF0:
+            need = 4
+        elif b >= 0xE0:
+            need = 3
+        elif b >= 0xC0:
+            need = 2
+        else:
+            need = 1
+
+        if need > i:
+            return data[:-i], data[-i:]
+        break
+
+    return data, ''
+
+
 class TerminalGUI(Terminal):
     def __init__(self, cfg):
         Terminal.__init__(self, cfg)
 
+        self.frame_scheduler = get_frame_scheduler(self.cfg.get_frame_interval())
+        self.frame_scheduler.register(self, self.__produce_frame)
+
+        self._term_widget = None
         self.term_widget = None
         self.session = None
 
@@ -42,7 +73,8 @@ class TerminalGUI(Terminal):
         self._saved_charset_mode = 0
 
         self._data_lock = threading.RLock()
-        self._screen_buffer = ScreenBuffer()
+        self._screen_buffer = self.create_screen_buffer()
+        self._snapshots = SnapshotPublisher()
 
         self._dec_mode = False
         self._force_column = False
@@ -56,6 +88,56 @@ class TerminalGUI(Terminal):
 
         self._cursor_visible = True
 
+    @property
+    def term_widget(self):
+        return self._term_widget
+
+    @term_widget.setter
+    def term_widget(self, term_widget):
+        #the widget is refreshed with the dirty rows of every frame
+        if self._term_widget:
+            self.frame_scheduler.unsubscribe(self, self._term_widget.refresh)
+
+        self._term_widget = term_widget
+
+        if term_widget:
+            self.frame_scheduler.subscribe(self, term_widget.refresh)
+
+    def __produce_frame(self):
+        if not self.term_widget:
+            return None
+
+        return self.publish_snapshot()
+
+    def create_screen_buffer(self, alternate = False):
+        if alternate:
+            #the alternate screen keeps no history, so nothing is frozen,
+            #spilled or left for searching
+            return ScreenBuffer(0, 0, False, False, None)
+
+        scrollback = self.cfg.get_scrollback_config()
+
+        return ScreenBuffer(scrollback['lines'],
+                            scrollback['hot_screens'],
+                            scrollback['compress'],
+                            scrollback['spill'],
+                            scrollback['spill_dir'])
+
+    def close_history(self):
+        self._screen_buffer.close()
+
+        #out of the alternate screen the saved buffer is the current one
+        if self.saved_screen_buffer is not self._screen_buffer:
+            self.saved_screen_buffer.close()
+
+    def close(self):
+        #the scheduler is shared with the other terminals
+        self.frame_scheduler.unregister(self)
+        self.disable_trace()
+
+        with self._data_lock:
+            self.close_history()
+
     def _set_default_tab_stops(self):
         tab_width = self.get_tab_width()
 
@@ -131,13 +213,16 @@ class TerminalGUI(Terminal):
                 if wrap_c[0].get_char() == '\000':
                     wrap_c = line.get_cells()[self.get_cols() - self.col - len(c) - 1:]
 
+                #cells are views of the line, take the chars before inserting
+                wrap_c = [cell.get_char() for cell in wrap_c]
+
                 two_bytes = len(wrap_c)
 
                 if self.cfg.debug_more:
                     LOGGER.debug(u'save buffer wrap:c=[{}], wrap=[{}]'.format(c, wrap_c))
 
                 self._save_buffer(c, insert)
-                self.wrap_line(''.join([c.get_char() for c in wrap_c]), insert)
+                self.wrap_line(''.join(wrap_c), insert)
             else:
                 self._save_buffer(c, insert)
         else:
@@ -202,6 +287,76 @@ class TerminalGUI(Terminal):
         except:
             LOGGER.exception('save buffer failed')
 
+    def output_text_run(self, data):
+        if self.in_status_line:
+            self.status_line.append(data)
+            return
+
+        try:
+            self.save_text_run(data)
+        except:
+            LOGGER.exception('save text run failed')
+
+    def save_text_run(self, data):
+        #bulk version of save_buffer for a run of plain text without
+        #any control char, decode once and write cells line by line
+        if len(self.remain_buffer) > 0:
+            data = ''.join(self.remain_buffer) + data
+            self.remain_buffer = []
+
+        data, remain = split_utf8_tail(data)
+
+        if len(remain) > 0:
+            self.remain_buffer.append(remain)
+
+        text = data.decode('utf_8', errors='ignore')
+
+        cols = self.get_cols()
+        col = self.col
+        translate = self.charset_modes_translate[self.charset_mode]
+        chars, wide_chars = [], []
+
+        for c in text:
+            if translate:
+                c = translate(c)
+
+            w = char_width(c)
+
+            if w == 0 or w == -1:
+                LOGGER.warning(u'save buffer get a invalid width char: w= {}, c={}'.format(w, c))
+
+            wide = w > 1
+
+            if col + (2 if wide else 1) > cols:
+                #wrap, same as wrap_line, the wrapped char takes one cell
+                self._write_text_cells(chars, wide_chars)
+                chars, wide_chars = [], []
+
+                self.col = 0
+                self.cursor_down(None)
+                col = 0
+                wide = False
+
+            chars.append(c)
+            wide_chars.append(wide)
+
+            if wide:
+                chars.append('\000')
+                wide_chars.append(wide)
+
+            col += 2 if wide else 1
+
+        self._write_text_cells(chars, wide_chars)
+
+    def _write_text_cells(self, chars, wide_chars):
+        if len(chars) == 0:
+            return
+
+        line = self.get_cur_line()
+        line.write_cells(self.col, chars, self.cur_line_option, wide_chars)
+
+        self.col += len(chars)
+
     def output_status_line_data(self, c):
         if c == '\x1b':
             LOGGER.error('status line data has escape char')
@@ -284,8 +439,7 @@ class TerminalGUI(Terminal):
     def clr_line(self, context):
         line = self.get_cur_line()
 
-        for cell in line.get_cells():
-            cell.reset(self.cur_line_option)
+        line.fill_cells(0, -1, get_attr_id(self.cur_line_option))
 
         self.refresh_display()
 
@@ -296,8 +450,7 @@ class TerminalGUI(Terminal):
         if line.get_cell(begin).get_char() == '\000':
             begin -= 1
 
-        for i in range(begin, line.cell_count()):
-            line.get_cell(i).reset(self.cur_line_option)
+        line.fill_cells(begin, -1, get_attr_id(self.cur_line_option))
 
         self.refresh_display()
 
@@ -308,8 +461,7 @@ class TerminalGUI(Terminal):
         if end + 1 < line.cell_count() and line.get_cell(end + 1).get_char() == '\000':
             end = end + 1
 
-        for i in range(end + 1):
-            line.get_cell(i).reset(self.cur_line_option)
+        line.fill_cells(0, end + 1, get_attr_id(self.cur_line_option))
 
         self.refresh_display()
 
@@ -320,53 +472,74 @@ class TerminalGUI(Terminal):
         if line.get_cell(begin).get_char() == '\000':
             begin -= 1
 
-        end = line.cell_count() \
-            if not overwrite or begin + count > line.cell_count() \
-            else begin + count
+        begin = max(begin, 0)
 
-        for i in range(begin, end):
-            if not overwrite and i + count < line.cell_count():
-                line.get_cell(i).copy(line.get_cell(i + count))
-            else:
-                line.get_cell(i).reset(self.cur_line_option)
+        if overwrite:
+            line.fill_cells(begin, min(begin + count, line.cell_count()),
+                            get_attr_id(self.cur_line_option))
+        else:
+            line.delete_cells(begin, count, get_attr_id(self.cur_line_option))
 
         self.refresh_display()
 
-    def refresh_display(self):
-        self.term_widget.refresh()
+    def insert_chars(self, count):
+        if self.col >= self.get_cols():
+            #the cursor is past the last col, the chars wrap to the next line
+            self.output_normal_data(' ' * count, True)
+            return
 
-    def lock_display_data_exec(self, func):
-        try:
-            # self._data_lock.acquire()
+        line = self.get_cur_line()
+        line.insert_cells(self.col, count, get_attr_id(self.cur_line_option), self.get_cols())
 
-            lines = self.get_text()
+    def refresh_display(self):
+        #only marks the display, the frame scheduler publishes and draws it
+        self.frame_scheduler.mark_dirty(self)
 
+    def publish_snapshot(self):
+        #the reader thread holds the lock for a whole chunk and the gui
+        #thread while it changes the buffer, a snapshot never has half of it
+        with self._data_lock:
             cursor_visible = not self._screen_buffer.is_view_history() \
                 and self._cursor_visible
 
-            self.term_widget.lines = lines
-            self.term_widget.term_cursor = self.get_cursor()
-            self.term_widget.cursor_visible = cursor_visible
+            return self._snapshots.publish(self.get_text(),
+                                    self.get_cursor(),
+                                           cursor_visible,
+                                           self._screen_buffer.get_search_highlights(),
+                                           self._screen_buffer.get_selection_highlights())
+
+    def lock_display_data_exec(self, func):
+        '''run func with the widget set to the latest screen snapshot
+
+        renderers only read the snapshot, never the screen buffer, so they
+        never wait for the parser thread
+        '''
+        try:
+            if not self._snapshots.has_snapshot():
+                self.publish_snapshot()
+
+            snapshot = self._snapshots.consume()
+
+            self.term_widget.lines = snapshot.lines
+            self.term_widget.term_cursor = snapshot.cursor
+            self.term_widget.cursor_visible = snapshot.cursor_visible
             self.term_widget.focus = True
-            self._screen_buffer.set_cursor(self.get_cursor()
-                                           if cursor_visible else None)
+            self.term_widget.dirty_rows = snapshot.dirty_rows
+            self.term_widget.search_highlights = snapshot.search_highlights
+            self.term_widget.selection_highlights = snapshot.selection_highlights
 
             func()
         except:
             LOGGER.exception('lock display data exec')
-        finally:
-            # self._data_lock.release()
-            pass
 
     def on_data(self, data):
         try:
-            # self._data_lock.acquire()
+            self._data_lock.acquire()
             Terminal.on_data(self, data)
         except:
             LOGGER.exception('on data')
         finally:
-            # self._data_lock.release()
-            pass
+            self._data_lock.release()
 
         self.refresh_display()
 
@@ -439,11 +612,8 @@ class TerminalGUI(Terminal):
 
                 end = self.row
 
-        for row in range(begin, end):
-            line = self.get_line(row)
-
-            for cell in line.get_cells():
-                cell.reset(self.cur_line_option)
+        self._screen_buffer.fill_lines(begin, end, self.get_cols(),
+                                       get_attr_id(self.cur_line_option))
 
         self.refresh_display()
 
@@ -601,12 +771,13 @@ class TerminalGUI(Terminal):
         self.saved_screen_buffer, self.saved_col, self.saved_row, self.saved_cur_line_option = \
           self._screen_buffer, self.col, self.row, self.cur_line_option
         self._screen_buffer, self.col, self.row, self.cur_line_option = \
-          ScreenBuffer(), 0, 0, get_default_text_attribute()
+          self.create_screen_buffer(True), 0, 0, get_default_text_attribute()
         self._screen_buffer.resize_buffer(self.get_rows(), self.get_cols())
         self._screen_buffer.clear_selection()
         self.refresh_display()
 
     def exit_ca_mode(self, context):
+        self._screen_buffer.close()
         self._screen_buffer, self.col, self.row, self.cur_line_option = \
             self.saved_screen_buffer, self.saved_col, self.saved_row, self.saved_cur_line_option
         self._screen_buffer.clear_selection()
@@ -787,22 +958,64 @@ class TerminalGUI(Terminal):
             handled = True
         elif key_state.has_shift() and \
                 (key_state.is_pageup_key() or key_state.is_pagedown_key()):
-            if not self._screen_buffer.is_view_history():
-                self._screen_buffer.view_history(True)
-            if key_state.is_pageup_key():
-                self._screen_buffer.view_history_pageup()
-            else:
-                self._screen_buffer.view_history_pagedown()
+            with self._data_lock:
+                if not self._screen_buffer.is_view_history():
+                    self._screen_buffer.view_history(True)
+                if key_state.is_pageup_key():
+                    self._screen_buffer.view_history_pageup()
+                else:
+                    self._screen_buffer.view_history_pagedown()
             handled = True
             view_history_key = True
             self.refresh_display()
+        elif self.has_search() and key_state.get_key_name() == 'f3':
+            if key_state.has_shift():
+                self.search_previous()
+            else:
+                self.search_next()
+            handled = True
+            view_history_key = True
 
         if not view_history_key and \
-                not key_state.is_shift_key():
-            self._screen_buffer.view_history(False)
+                not key_state.is_shift_key() and \
+                (self._screen_buffer.is_view_history() or self.has_search()):
+            with self._data_lock:
+                self._screen_buffer.view_history(False)
+                self._screen_buffer.clear_search()
+            self.refresh_display()
 
         return handled
 
+    def search_history(self, pattern, regex = False, case_sensitive = True):
+        with self._data_lock:
+            found = self._screen_buffer.search(pattern, regex, case_sensitive)
+        self.refresh_display()
+
+        return found
+
+    def search_next(self):
+        with self._data_lock:
+            found = self._screen_buffer.search_next()
+        self.refresh_display()
+
+        return found
+
+    def search_previous(self):
+        with self._data_lock:
+            found = self._screen_buffer.search_previous()
+        self.refresh_display()
+
+        return found
+
+    def has_search(self):
+        return self._screen_buffer.has_search()
+
+    def cancel_search(self):
+        with self._data_lock:
+            self._screen_buffer.clear_search()
+            self._screen_buffer.view_history(False)
+        self.refresh_display()
+
     def has_selection(self):
         return self._screen_buffer.has_selection()
 
@@ -810,9 +1023,8 @@ class TerminalGUI(Terminal):
         if not self.has_selection():
             return ''
 
-        lines = self._screen_buffer.get_selection_text()
-
-        texts = map(lambda x: ''.join(x.get_selection_text()), lines)
+        with self._data_lock:
+            texts = self._screen_buffer.get_selection_text()
 
         d = '\r\n'
 
@@ -870,7 +1082,10 @@ class TerminalGUI(Terminal):
         data = ''
         if self.has_selection():
             data = self.get_selection_text()
-            self._screen_buffer.clear_selection()
+
+            with self._data_lock:
+                self._screen_buffer.clear_selection()
+            self.refresh_display()
 
         if len(data) == 0:
             data = self.term_widget.paste_from_clipboard()
@@ -888,18 +1103,23 @@ class TerminalGUI(Terminal):
 
         self.term_widget.copy_to_clipboard(data)
 
-        self._screen_buffer.clear_selection()
+        with self._data_lock:
+            self._screen_buffer.clear_selection()
+        self.refresh_display()
 
     def resize_terminal(self):
-        self._screen_buffer.resize_buffer(self.get_rows(), self.get_cols())
+        with self._data_lock:
+            self._screen_buffer.resize_buffer(self.get_rows(), self.get_cols())
 
-        self.set_scroll_region(0, self.get_rows() - 1)
+            self.set_scroll_region(0, self.get_rows() - 1)
 
-        if self.row >= self.get_rows():
-            self.row = self.get_rows() - 1
+            if self.row >= self.get_rows():
+                self.row = self.get_rows() - 1
 
-        if self.col >= self.get_cols():
-            self.col = self.get_cols() - 1
+            if self.col >= self.get_cols():
+                self.col = self.get_cols() - 1
+
+        self.refresh_display()
 
     def enter_status_line(self, mode, enter):
         if not enter:
@@ -918,6 +1138,15 @@ class TerminalGUI(Terminal):
         self.session.on_status_line(mode, status_line)
 
     def determin_colors(self, attr):
+        #colors only depend on the attribute and the color table, resolve
+        #each attribute id once until the color table changes
+        try:
+            return self.cfg.attr_colors[attr.get_value()]
+        except KeyError:
+            colors = self.cfg.attr_colors[attr.get_value()] = self.__resolve_colors(attr)
+            return colors
+
+    def __resolve_colors(self, attr):
         if self.cfg.debug_more:
             LOGGER.debug('determin_colors:attr={}'.format(attr))
 
@@ -948,12 +1177,6 @@ class TerminalGUI(Terminal):
         if attr.has_mode(TextMode.REVERSE):
             f_color, b_color = b_color, f_color
 
-        if attr.has_mode(TextMode.SELECTION):
-            f_color, b_color = b_color, f_color
-
-        if attr.has_mode(TextMode.CURSOR):
-            f_color, b_color = b_color, self.cfg.default_cursor_color
-
         return (f_color, b_color)
 
     def send_primary_device_attributes(self, context):
@@ -975,4 +1198,6 @@ class TerminalGUI(Terminal):
         self.refresh_display()
 
     def set_selection(self, s_f, s_t):
-        self._screen_buffer.set_selection(s_f, s_t)
+        with self._data_lock:
+            self._screen_buffer.set_selection(s_f, s_t)
+        self.refresh_display()
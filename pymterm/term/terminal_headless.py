@@ -0,0 +1,80 @@
+import logging
+
+from session_config import SessionConfig
+from terminal_gui import TerminalGUI
+from terminal_widget import TerminalWidget
+
+LOGGER = logging.getLogger('term_headless')
+
+
+class HeadlessConfig(SessionConfig):
+    def __init__(self, term_name = 'xterm-256color', config = None):
+        self.term_name = term_name
+        self.session_name = None
+        self.config = config if config is not None else {}
+        self.debug = False
+        self.debug_more = False
+        self.color_theme = None
+
+        self.init_color_table()
+
+
+class HeadlessWidget(TerminalWidget):
+    def __init__(self, rows, cols, refresh_callback = None):
+        super(HeadlessWidget, self).__init__()
+
+        self.visible_rows = rows
+        self.visible_cols = cols
+        self.refresh_callback = refresh_callback
+        self.clipboard = ''
+
+    def refresh(self, dirty_rows = None):
+        if self.refresh_callback:
+            self.refresh_callback()
+
+    def copy_to_clipboard(self, data):
+        self.clipboard = data
+
+    def paste_from_clipboard(self):
+        return self.clipboard
+
+
+class HeadlessSession(object):
+    def __init__(self, send_callback = None):
+        self.send_callback = send_callback
+        self.stopped = False
+
+    def send(self, data):
+        if self.send_callback:
+            self.send_callback(data)
+
+    def on_status_line(self, mode, status_line):
+        LOGGER.debug('status line:mode={}, {}'.format(mode, status_line))
+
+
+class TerminalHeadless(TerminalGUI):
+    '''a terminal without any gui toolkit
+
+    the screen has an explicit size, refresh calls refresh_callback if given,
+    data the terminal answers to the host goes to send_callback
+    '''
+    def __init__(self, cfg = None, rows = 24, cols = 80,
+                 refresh_callback = None, send_callback = None):
+        TerminalGUI.__init__(self, cfg if cfg else HeadlessConfig())
+
+        self.term_widget = HeadlessWidget(rows, cols, refresh_callback)
+        self.session = HeadlessSession(send_callback)
+
+        self.resize_terminal()
+
+    def resize(self, rows, cols):
+        self.term_widget.visible_rows = rows
+        self.term_widget.visible_cols = cols
+
+        self.resize_terminal()
+
+    def get_screen_lines(self):
+        return [line.get_text() for line in self.get_text()]
+
+    def get_screen_text(self):
+        return '\n'.join(self.get_screen_lines())
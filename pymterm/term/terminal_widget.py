@@ -8,17 +8,57 @@ class TerminalWidget(object):
         self.visible_rows = 24
         self.visible_cols = 80
         self.lines = []
+        self.dirty_rows = set()
+        self.search_highlights = []
+        self.search_highlight_color = [0xff, 0xd7, 0x00, 0x80]
+        self.selection_highlights = []
+        self.selection_highlight_color = [0x2f, 0xa7, 0xd4, 0x80]
         self.line_options = []
         self.term_cursor = (0, 0)
         self.cursor_visible = True
+        self.cursor_shape = 'block'
+        self.cursor_blink = False
+        self.cursor_blink_interval = .5
+        self.cursor_blink_on = True
         self._selection_from = self._selection_to = self.term_cursor
         self._selection = False
         self._selection_finished = True
 
-    def refresh(self):
+    def refresh(self, dirty_rows = None):
         logging.getLogger('term_widget').debug('default refresh do nothing')
         pass
 
+    def set_cursor_config(self, cursor_config):
+        self.cursor_shape = cursor_config['shape']
+        self.cursor_blink = cursor_config['blink']
+        self.cursor_blink_interval = cursor_config['blink_interval']
+        self.cursor_blink_on = True
+
+    def blink_cursor(self):
+        self.cursor_blink_on = not self.cursor_blink_on
+        self.refresh()
+
+    def get_cursor_box(self, col_width, line_height):
+        '''(left, top, width, height) of the cursor from the top left of
+        the text area, None when the cursor is not shown
+
+        the cursor is drawn over the lines, the cells are not changed
+        '''
+        if not self.cursor_visible or not self.cursor_blink_on:
+            return None
+
+        col, row = self.term_cursor
+        left, top = col * col_width, row * line_height
+
+        if self.cursor_shape == 'underline':
+            height = max(line_height // 8, 2)
+            return (left, top + line_height - height, col_width, height)
+
+        if self.cursor_shape == 'bar':
+            return (left, top, max(col_width // 8, 2), line_height)
+
+        return (left, top, col_width, line_height)
+
     def norm_text(self, text, removeDoubleWidthPaddingChar = True):
         text = text.replace('\t', ' ' * self.tab_width)
         text = text.replace('\000', '' if removeDoubleWidthPaddingChar else '\000')
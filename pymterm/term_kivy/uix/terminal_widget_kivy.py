@@ -328,7 +328,7 @@ class TerminalWidgetKivy(FocusBehavior, Widget, TerminalWidget):
 
         return width
 
-    def refresh(self):
+    def refresh(self, dirty_rows = None):
         self._trigger_texture()
 
     def on_touch_down(self, touch):
@@ -66,6 +66,7 @@ class TerminalPygletApp():
         session.terminal.term_widget = window
         window.session = session
         window.tab_width = session.get_tab_width()
+        window.set_cursor_config(cfg.get_cursor_config())
 
         self._windows.append(window)
 
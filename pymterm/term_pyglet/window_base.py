@@ -5,7 +5,8 @@ import layout
 
 from functools32 import lru_cache
 
-from OpenGL.GL import glClearColor
+from OpenGL.GL import glClearColor, glEnable, glBlendFunc
+from OpenGL.GL import GL_BLEND, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_QUADS
 
 import pyglet
 from pyglet.window import key
@@ -30,16 +31,6 @@ SINGLE_WIDE_CHARACTERS =    \
 LOGGER = logging.getLogger('term_pyglet')
 
 
-def update(dt):
-    pass
-
-
-# this interval task make sure the window
-# will be refreshed at most 5 times persecond
-# the real window update only happends
-# when window.invlid and _legacy_invalid are true
-pyglet.clock.schedule_interval(update, .2)
-
 PADDING = 5
 FONT_NAME = 'WenQuanYi Micro Hei Mono'
 LEADING = 0
@@ -69,6 +60,7 @@ class TermPygletWindowBase(pyglet.window.Window, TerminalWidget):
         self._need_redraw = False
         self._batch = pyglet.graphics.Batch()
         self._draw_lines = []
+        self._draw_size = None
 
     def on_resize(self, w, h):
         col_width, line_height = self._get_layout_info()
@@ -206,53 +198,91 @@ class TermPygletWindowBase(pyglet.window.Window, TerminalWidget):
                                  batch=batch,
                                  height=line_height)
 
+    def set_cursor_config(self, cursor_config):
+        TerminalWidget.set_cursor_config(self, cursor_config)
+
+        pyglet.clock.unschedule(self._blink_cursor)
+
+        if self.cursor_blink:
+            pyglet.clock.schedule_interval(self._blink_cursor, self.cursor_blink_interval)
+
+    def _blink_cursor(self, dt):
+        self.blink_cursor()
+
+    def on_close(self):
+        pyglet.clock.unschedule(self._blink_cursor)
+        super(TermPygletWindowBase, self).on_close()
+
     def on_draw(self):
         glClearColor(*self._clear_color)
         self.clear()
         self._draw_content()
         self._batch.draw()
+        self._draw_cursor()
         self.invalid = False
         self._legacy_invalid = False
 
+    def _draw_cursor(self):
+        col_width, line_height = self._get_layout_info()
+        box = self.get_cursor_box(col_width, line_height)
+
+        if not box:
+            return
+
+        l, t, w, h = box
+        cursor_color = self.session.cfg.default_cursor_color
+
+        if self.cursor_shape == 'block':
+            #the block is drawn over the text, keep the text readable
+            cursor_color = cursor_color[:3] + [0x80]
+
+        #pyglet counts y from the bottom
+        x1 = PADDING + l
+        y1 = self.height - PADDING - t - h
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        pyglet.graphics.draw(4, GL_QUADS,
+                             ('v2f', (x1, y1, x1 + w, y1, x1 + w, y1 + h, x1, y1 + h)),
+                             ('c4B', tuple(cursor_color) * 4))
+
     def _draw_content(self):
         col_width, line_height = self._get_layout_info()
 
         def locked_draw():
-            y = self.height - PADDING - line_height
-
-            index = 0
-            for line in self.lines:
-                try:
-                    if self._draw_lines[index][0] == line \
-                       and not line.need_calc_hash():
-                        index += 1
-                        y -= line_height
-                        continue
-                except:
-                    pass
-
-                try:
-                    self._draw_lines[index][1].delete()
-                except:
-                    pass
-
-                layout = self._create_line_layout(line, self._batch)
+            lines = self.lines
+
+            #the layouts of the rows not changed since the last snapshot
+            #drawn stay in the batch, unless the window was resized
+            if self._draw_size != (self.width, self.height, len(lines)):
+                self._draw_size = (self.width, self.height, len(lines))
+                rows = range(len(lines))
+
+                for layout in self._draw_lines[len(lines):]:
+                    if layout:
+                        layout.delete()
+                del self._draw_lines[len(lines):]
+            else:
+                rows = sorted(self.dirty_rows)
+
+            for index in rows:
+                if index < len(self._draw_lines) and self._draw_lines[index]:
+                    self._draw_lines[index].delete()
+
+                layout = self._create_line_layout(lines[index], self._batch)
 
                 if layout:
                     layout.begin_update()
                     layout.x = PADDING
-                    layout.y = y
+                    layout.y = self.height - PADDING - line_height * (index + 1)
                     layout.width = self.width - PADDING * 2
                     layout.height = line_height
                     layout.end_update()
 
-                try:
-                    self._draw_lines[index] = (line, layout)
-                except:
-                    self._draw_lines.append((line, layout))
-
-                y -= line_height
-                index += 1
+                if index < len(self._draw_lines):
+                    self._draw_lines[index] = layout
+                else:
+                    self._draw_lines.append(layout)
 
         if (self.session):
             self.session.terminal.lock_display_data_exec(locked_draw)
@@ -261,12 +291,14 @@ class TermPygletWindowBase(pyglet.window.Window, TerminalWidget):
         if self.session:
             self.session.start()
 
-    def refresh(self):
-        def update_content(dt):
-            self.invalid = True
-            self._legacy_invalid = True
+    def refresh(self, dirty_rows = None):
+        #called from the frame thread, posting the event wakes up the event
+        #loop, which draws the window once it is invalid
+        pyglet.app.platform_event_loop.post_event(self, 'on_refresh')
 
-        pyglet.clock.schedule_once(update_content, 0)
+    def on_refresh(self):
+        self.invalid = True
+        self._legacy_invalid = True
 
     def on_key_press(self, symbol, modifiers):
         if pymterm.debug_log:
@@ -306,3 +338,6 @@ class TermPygletWindowBase(pyglet.window.Window, TerminalWidget):
                 self._key_first_down = False
             else:
                 self.on_key_press(key.BACKSPACE, 0)
+
+
+TermPygletWindowBase.register_event_type('on_refresh')
@@ -9,10 +9,18 @@ file_cmds += 'prev_tab_cmd'
 file_cmds += 'open_session_cmd'
 file_cmds += 'transfer_file_cmd'
 
+edit_cmds += 'find_cmd'
+edit_cmds += 'find_next_cmd'
+edit_cmds += 'find_previous_cmd'
+
 _edit_menu_items = [
     ("Copy/^C",       'copy_cmd'),
     ("Paste/^V",      'paste_cmd'),
     ("Clear",        'clear_cmd'),
+    "-",
+    ("Find...",       'find_cmd'),
+    ("Find Next",     'find_next_cmd'),
+    ("Find Previous", 'find_previous_cmd'),
 ]
 
 _help_menu_items = [
@@ -5,7 +5,7 @@ import os
 
 from GUI import Application, Document, Window, TabView
 from GUI import FileDialogs
-from GUI import ModalDialog, Label, Button
+from GUI import ModalDialog, Label, Button, CheckBox
 from GUI import RadioGroup, RadioButton
 from GUI import Task
 from GUI import TextField
@@ -63,6 +63,45 @@ class PasswordDialog(ModalDialog):
         if self._action.next_action:
             self._action.next_action.execute()
 
+class SearchDialog(ModalDialog):
+    def __init__(self, terminal, **kwargs):
+        title = 'Find'
+
+        self._terminal = terminal
+
+        ModalDialog.__init__(self, title=title)
+
+        label = Label('Find in history:')
+        self.txt_pattern = TextField(multiline = False)
+        self.chk_regex = CheckBox('Regular expression')
+        self.chk_case = CheckBox('Match case', on = True)
+
+        self.ok_button = Button("Find", action = "ok", enabled = True, style = 'default')
+        self.cancel_button = Button("Cancel", enabled = True, style = 'cancel', action='cancel')
+
+        self.place(label, left = padding, top = padding)
+        self.place(self.txt_pattern, left = padding, top = label + padding,
+                   right= label.right if label.right > 260 else 260)
+        self.place(self.chk_regex, left = padding, top = self.txt_pattern + padding)
+        self.place(self.chk_case, left = padding, top = self.chk_regex + padding)
+
+        self.place(self.cancel_button, top = self.chk_case + padding, right = self.txt_pattern.right)
+        self.place(self.ok_button, top = self.chk_case + padding, right = self.cancel_button - padding)
+        self.shrink_wrap(padding = (padding, padding))
+
+    def ok(self):
+        if len(self.txt_pattern.text) == 0:
+            return
+        self.dismiss(True)
+
+        if not self._terminal.search_history(self.txt_pattern.text,
+                                             self.chk_regex.on,
+                                             self.chk_case.on):
+            stop_alert('Not found:{}'.format(self.txt_pattern.text))
+
+    def cancel(self):
+        self.dismiss(False)
+
 class LoginDialog(ModalDialog):
 
     def __init__(self, session, transport,  **kwargs):
@@ -313,6 +352,7 @@ class TerminalPyGUIApp(Application):
         session.terminal.term_widget = view
         view.session = session
         view.tab_width = session.get_tab_width()
+        view.set_cursor_config(cfg.get_cursor_config())
 
         self._session_task = Task(session.start, .1)
         #session.start()
@@ -386,6 +426,16 @@ class TerminalPyGUIApp(Application):
         dlog = FileTransferDialog(view.session)
         dlog.present()
 
+    def find_cmd(self):
+        win = self.get_target_window()
+        tab_view = win.tabview
+
+        if tab_view.selected_index < 0:
+            return
+        view = tab_view.items[tab_view.selected_index]
+        dlog = SearchDialog(view.session.terminal)
+        dlog.present()
+
 
 class TerminalPyGUIDoc(Document):
     def new_contents(self):
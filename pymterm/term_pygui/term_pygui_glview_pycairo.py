@@ -109,6 +109,13 @@ class TerminalPyGUIGLView(TerminalPyGUIGLViewBase):
 
         return t_w, line_height, l
 
+    def _paint_overlay(self, v_context, color, l, t, w, h):
+        r, g, b, a = color
+
+        v_context.set_source_rgba(r, g, b, a)
+        v_context.rectangle(l, t, w, h)
+        v_context.fill()
+
     def _fill_line_background(self, context, cur_b_color, l, t, w, h):
         line_context, line_p_context = context
         r, g, b, a = cur_b_color
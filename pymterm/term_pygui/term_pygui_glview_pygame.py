@@ -69,6 +69,11 @@ class TerminalPyGUIGLView(TerminalPyGUIGLViewBase):
     def _paint_line_surface(self, v_context, line_surf, x, y):
         v_context.blit(line_surf, (x, y))
 
+    def _paint_overlay(self, v_context, color, l, t, w, h):
+        overlay = pygame.Surface((w, h), SRCALPHA)
+        overlay.fill(color)
+        v_context.blit(overlay, (l, t))
+
     def _prepare_line_context(self, line_surf, x, y, w, h):
         line_surf.fill(self.session.cfg.default_background_color)
         return line_surf
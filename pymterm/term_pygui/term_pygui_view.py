@@ -48,6 +48,22 @@ class TerminalPyGUIView(TerminalPyGUIViewBase, View):
     def _paint_line_surface(self, v_context, line_surf, x, y):
         pass
 
+    def _paint_overlay(self, v_context, color, l, t, w, h):
+        # canvas colors have no alpha here, fill with the color blended over
+        # the background before the text is drawn
+        bg = self.session.cfg.default_background_color
+        a = color.alpha
+
+        tmp_c, v_context.fillcolor = v_context.fillcolor, \
+            rgb(color.red * a + bg.red * (1 - a),
+                color.green * a + bg.green * (1 - a),
+                color.blue * a + bg.blue * (1 - a))
+        v_context.fill_rect((l, t, l + w, t + h))
+        v_context.fillcolor = tmp_c
+
+    def _overlay_under_text(self):
+        return True
+
     def _prepare_line_context(self, line_surf, x, y, width, height):
         return (line_surf, x, y, width, height)
 
@@ -52,7 +52,12 @@ class TerminalPyGUIViewBase(TerminalWidget):
         self.selection_color = [0.1843, 0.6549, 0.8313, .5]
         self._width_cache = {}
         self._lock = threading.Lock()
-        self._refresh_task = Task(self.__refresh, .02, False, False)
+        #the frame scheduler paces the refreshes, the task only runs
+        #the redraw in the gui thread
+        self._refresh_task = Task(self.__refresh, 0, False, False)
+        self._cursor_blink_task = None
+        self._row_surfs = []
+        self._row_surfs_size = None
 
         TerminalWidget.__init__(self, **kwargs)
 
@@ -70,9 +75,19 @@ class TerminalPyGUIViewBase(TerminalWidget):
             self.invalidate()
             self.update()
 
-    def refresh(self):
+    def refresh(self, dirty_rows = None):
         self._refresh_task.start()
 
+    def set_cursor_config(self, cursor_config):
+        TerminalWidget.set_cursor_config(self, cursor_config)
+
+        if self._cursor_blink_task:
+            self._cursor_blink_task.stop()
+            self._cursor_blink_task = None
+
+        if self.cursor_blink:
+            self._cursor_blink_task = Task(self.blink_cursor, self.cursor_blink_interval, True)
+
     def key_down(self, e):
         key_state = KeyState(e)
 
@@ -100,6 +115,8 @@ class TerminalPyGUIViewBase(TerminalWidget):
         return
 
     def destroy(self):
+        if self._cursor_blink_task:
+            self._cursor_blink_task.stop()
         self.session.stop()
         super(TerminalPyGUIViewBase, self).destroy()
 
@@ -206,8 +223,14 @@ class TerminalPyGUIViewBase(TerminalWidget):
             m.paste_cmd.enabled = self.session.terminal.has_selection() or application().query_clipboard()
             m.clear_cmd.enabled = self.session.terminal.has_selection()
             m.transfer_file_cmd.enabled = hasattr(self.session, "transfer_file")
+            m.find_cmd.enabled = True
+            m.find_next_cmd.enabled = self.session.terminal.has_search()
+            m.find_previous_cmd.enabled = self.session.terminal.has_search()
         else:
             m.transfer_file_cmd.enabled = False
+            m.find_cmd.enabled = False
+            m.find_next_cmd.enabled = False
+            m.find_previous_cmd.enabled = False
             m.copy_cmd.enabled = False
             m.paste_cmd.enabled = False
             m.clear_cmd.enabled = False
@@ -223,6 +246,14 @@ class TerminalPyGUIViewBase(TerminalWidget):
         if self.session and self.session.terminal:
             self.session.terminal.paste_data()
 
+    def find_next_cmd(self):
+        if self.session and self.session.terminal:
+            self.session.terminal.search_next()
+
+    def find_previous_cmd(self):
+        if self.session and self.session.terminal:
+            self.session.terminal.search_previous()
+
     @lru_cache(1)
     def _get_col_width(self):
         f = self._get_font()
@@ -274,6 +305,36 @@ class TerminalPyGUIViewBase(TerminalWidget):
     def _draw_layouted_line_text(self, line_context, layout, cur_f_color, l, t, w, h):
         pass
 
+    def _paint_overlay(self, v_context, color, l, t, w, h):
+        pass
+
+    def _overlay_under_text(self):
+        # overlays are blended over the drawn line unless the view can not blend
+        return False
+
+    def _paint_row_overlays(self, v_context, row, y, col_width, line_height):
+        # drawn over the line surface, so the cached line stays untouched
+        for highlights, color in ((self.selection_highlights, self.selection_highlight_color),
+                                  (self.search_highlights, self.search_highlight_color)):
+            for h_row, begin_col, end_col in highlights:
+                if h_row == row:
+                    self._paint_overlay(v_context, self.gen_render_color(color),
+                                        self.padding_x + begin_col * col_width, y,
+                                        (end_col - begin_col) * col_width, line_height)
+
+    def _paint_cursor(self, v_context, col_width, line_height):
+        box = self.get_cursor_box(col_width, line_height)
+
+        if not box:
+            return
+
+        l, t, w, h = box
+        cfg = self.session.cfg
+
+        self._paint_overlay(v_context,
+                            cfg.cursor_overlay_color if self.cursor_shape == 'block' else cfg.default_cursor_color,
+                            self.padding_x + l, self.padding_y + t, w, h)
+
     def _do_cache(self):
         return True
 
@@ -299,6 +360,10 @@ class TerminalPyGUIViewBase(TerminalWidget):
 
         width, height = self.size
 
+        if self._row_surfs_size != (width, line_height, len(lines)):
+            self._row_surfs = [None] * len(lines)
+            self._row_surfs_size = (width, line_height, len(lines))
+
         for i in range(len(lines)):
             x = b_x = self.padding_x
             line = lines[i]
@@ -308,12 +373,24 @@ class TerminalPyGUIViewBase(TerminalWidget):
             text = ''
 
             if self._do_cache():
+                cached_line_surf = self._row_surfs[i]
+
+                # the row did not change since the last snapshot drawn,
+                # its surface is painted without looking up the line
+                if cached_line_surf and cached_line_surf.cached and i not in self.dirty_rows:
+                    self._paint_line_surface(v_context, cached_line_surf.surf, 0, y)
+                    self._paint_row_overlays(v_context, i, y, col_width, line_height)
+
+                    y += line_height
+                    continue
+
                 key = self._get_cache_key(line)
-                cached_line_surf = _get_surf(key, width, line_height)
+                cached_line_surf = self._row_surfs[i] = _get_surf(key, width, line_height)
                 line_surf = cached_line_surf.surf
 
                 if cached_line_surf.cached:
                     self._paint_line_surface(v_context, line_surf, 0, y)
+                    self._paint_row_overlays(v_context, i, y, col_width, line_height)
 
                     y += line_height
                     continue
@@ -379,6 +456,12 @@ class TerminalPyGUIViewBase(TerminalWidget):
                                                    col_width * (cur_col - last_col),
                                                    line_height)
 
+            if self._overlay_under_text():
+                self._paint_row_overlays(v_context, i, y, col_width, line_height)
+
+                if i == c_row:
+                    self._paint_cursor(v_context, col_width, line_height)
+
             for cell in line.get_cells():
                 if cell.get_char() != ' ':
                     render_text(b_x, cell)
@@ -387,4 +470,10 @@ class TerminalPyGUIViewBase(TerminalWidget):
 
             self._paint_line_surface(v_context, line_surf, 0, y)
 
+            if not self._overlay_under_text():
+                self._paint_row_overlays(v_context, i, y, col_width, line_height)
+
             y += line_height
+
+        if not self._overlay_under_text():
+            self._paint_cursor(v_context, col_width, line_height)
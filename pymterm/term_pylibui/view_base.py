@@ -55,7 +55,9 @@ class TerminalPyGUIViewBase(TerminalWidget):
         self.selection_color = [0.1843, 0.6549, 0.8313, .5]
         self._width_cache = {}
         self._lock = threading.Lock()
-        self._refresh_task = Task(self.__refresh, .02, False, False)
+        #the frame scheduler paces the refreshes, the task only runs
+        #the redraw in the gui thread
+        self._refresh_task = Task(self.__refresh, 0, False, False)
 
         TerminalWidget.__init__(self, **kwargs)
         
@@ -78,7 +80,7 @@ class TerminalPyGUIViewBase(TerminalWidget):
             self.invalidate()
             self.update()
 
-    def refresh(self):
+    def refresh(self, dirty_rows = None):
         self._refresh_task.start()
 
     def key_down(self, e):
@@ -0,0 +1,123 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'pymterm'))
+
+import pymterm
+pymterm.debug_log = pymterm.debug_more_log = False
+
+from term import DEFAULT_BG_COLOR_IDX
+from term.terminal_headless import TerminalHeadless
+
+
+class EditingTestBase(unittest.TestCase):
+    rows, cols = 3, 10
+
+    def setUp(self):
+        self.term = TerminalHeadless(rows=self.rows, cols=self.cols)
+
+    def tearDown(self):
+        self.term.close()
+
+    def feed(self, data):
+        self.term.on_data(data)
+
+        return [line.rstrip() for line in self.term.get_screen_lines()], self.term.get_cursor()
+
+
+class ScrollingRegionEditingTest(EditingTestBase):
+    rows, cols = 24, 10
+
+    def setUp(self):
+        super(ScrollingRegionEditingTest, self).setUp()
+
+        self.term.on_data(''.join(['\x1b[%d;1Hr%02d' % (i + 1, i + 1) for i in range(24)]))
+        self.term.on_data('\x1b[5;20r')
+
+    def rows_of(self, *names):
+        return [u'r%02d' % i if i else u'' for i in names]
+
+    def test_insert_lines(self):
+        lines, cursor = self.feed('\x1b[7;1H\x1b[2L')
+
+        self.assertEqual(lines, self.rows_of(*(range(1, 7) + [0, 0] + range(7, 19) + range(21, 25))))
+        self.assertEqual(cursor, (0, 6))
+
+    def test_delete_lines(self):
+        self.feed('\x1b[7;1H\x1b[2L')
+        lines, cursor = self.feed('\x1b[10;1H\x1b[3M')
+
+        self.assertEqual(lines, self.rows_of(*(range(1, 7) + [0, 0, 7] + range(11, 19) + [0, 0, 0]
+                                               + range(21, 25))))
+        self.assertEqual(cursor, (0, 9))
+
+    def test_delete_lines_past_region_end(self):
+        lines, cursor = self.feed('\x1b[18;1H\x1b[9M')
+
+        self.assertEqual(lines, self.rows_of(*(range(1, 18) + [0, 0, 0] + range(21, 25))))
+
+    def test_insert_lines_out_of_region(self):
+        lines, cursor = self.feed('\x1b[2;1H\x1b[2L')
+
+        self.assertEqual(lines, self.rows_of(*range(1, 25)))
+
+    def test_line_feed_at_region_end(self):
+        lines, cursor = self.feed('\x1b[20;1H\n\n')
+
+        self.assertEqual(lines, self.rows_of(*(range(1, 5) + range(7, 21) + [0, 0] + range(21, 25))))
+        self.assertEqual(cursor, (0, 19))
+
+
+class LineEditingTest(EditingTestBase):
+    def setUp(self):
+        super(LineEditingTest, self).setUp()
+
+        self.term.on_data('abcdefghij\r\nabcdefghij\r\nabcdefghij')
+
+    def test_insert_chars(self):
+        self.assertEqual(self.feed('\x1b[1;3H\x1b[2@'),
+                         ([u'ab  cdefgh', u'abcdefghij', u'abcdefghij'], (2, 0)))
+
+    def test_insert_chars_past_right_margin(self):
+        self.assertEqual(self.feed('\x1b[1;9H\x1b[5@'),
+                         ([u'abcdefgh', u'abcdefghij', u'abcdefghij'], (8, 0)))
+
+    def test_delete_chars(self):
+        self.assertEqual(self.feed('\x1b[1;3H\x1b[2P'),
+                         ([u'abefghij', u'abcdefghij', u'abcdefghij'], (2, 0)))
+
+    def test_delete_chars_past_right_margin(self):
+        self.assertEqual(self.feed('\x1b[1;9H\x1b[5P'),
+                         ([u'abcdefgh', u'abcdefghij', u'abcdefghij'], (8, 0)))
+
+    def test_erase_chars(self):
+        self.assertEqual(self.feed('\x1b[1;3H\x1b[3X'),
+                         ([u'ab   fghij', u'abcdefghij', u'abcdefghij'], (2, 0)))
+
+    def test_erase_line(self):
+        self.assertEqual(self.feed('\x1b[1;6H\x1b[K'),
+                         ([u'abcde', u'abcdefghij', u'abcdefghij'], (5, 0)))
+        self.assertEqual(self.feed('\x1b[2;6H\x1b[1K'),
+                         ([u'abcde', u'      ghij', u'abcdefghij'], (5, 1)))
+        self.assertEqual(self.feed('\x1b[3;6H\x1b[2K'),
+                         ([u'abcde', u'      ghij', u''], (5, 2)))
+
+    def test_erase_display_below(self):
+        self.assertEqual(self.feed('\x1b[2;6H\x1b[J'), ([u'abcdefghij', u'abcde', u''], (5, 1)))
+
+    def test_erase_display_above(self):
+        self.assertEqual(self.feed('\x1b[2;6H\x1b[1J'), ([u'', u'      ghij', u'abcdefghij'], (5, 1)))
+
+    def test_erase_display(self):
+        self.assertEqual(self.feed('\x1b[2;6H\x1b[2J'), ([u'', u'', u''], (5, 1)))
+
+    def test_background_color_erase(self):
+        self.feed('\x1b[44m\x1b[1;6H\x1b[K\x1b[1;1H\x1b[2@')
+
+        self.assertEqual([cell.get_attr().get_bg_idx() for cell in self.term.get_text()[0].get_cells()],
+                         [4, 4] + [DEFAULT_BG_COLOR_IDX] * 5 + [4, 4, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+# coding=utf-8
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'pymterm'))
+
+import pymterm
+pymterm.debug_log = pymterm.debug_more_log = False
+
+from term import Line, TextMode, get_default_text_attribute
+from term.cold_history import ColdHistory
+from term.disk_history import DiskHistory
+from term.history_search import HistoryIndex, compile_pattern
+
+
+def create_line(i):
+    text = u'line {} 中'.format(i)
+    attr = get_default_text_attribute()
+
+    if i % 2:
+        attr.set_mode(TextMode.BOLD)
+
+    line = Line()
+    line.write_cells(0, list(text[:-1]) + [text[-1], u'\000'], attr,
+                     [False] * (len(text) - 1) + [True, True])
+
+    return line
+
+
+class ColdHistoryTest(unittest.TestCase):
+    def create_history(self, count, compress = True):
+        history = ColdHistory(compress, 8)
+        lines = [create_line(i) for i in range(count)]
+
+        for line in lines:
+            history.append(line)
+
+        return history, lines
+
+    def assert_lines(self, history, lines):
+        self.assertEqual(len(history), len(lines))
+        self.assertEqual([history.get_line(i).encode() for i in range(len(history))],
+                         [line.encode() for line in lines])
+
+    def test_get_line(self):
+        for compress in (True, False):
+            history, lines = self.create_history(21, compress)
+
+            self.assert_lines(history, lines)
+            self.assertEqual([line.encode() for line in history.get_lines(-1, 3)],
+                             [line.encode() for line in lines[:3]])
+
+    def test_pop_oldest(self):
+        for compress in (True, False):
+            history, lines = self.create_history(21, compress)
+
+            #pop over the sealed blocks into the open block
+            for i in range(20):
+                self.assertEqual(history.pop_oldest(), lines[i].encode())
+                self.assert_lines(history, lines[i + 1:])
+
+            history.append(lines[0])
+            self.assert_lines(history, [lines[20], lines[0]])
+
+    def test_out_of_range(self):
+        history, lines = self.create_history(3)
+
+        self.assertRaises(IndexError, history.get_line, 3)
+        self.assertRaises(IndexError, history.get_line, -1)
+
+        for i in range(3):
+            history.pop_oldest()
+
+        self.assertRaises(IndexError, history.pop_oldest)
+
+
+class DiskHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+        self.history = DiskHistory(self.spill_dir)
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.spill_dir)
+
+    def test_get_line(self):
+        lines = [create_line(i) for i in range(20)]
+
+        #lines are read back between the appends
+        for i, line in enumerate(lines):
+            self.history.append(line.encode())
+            self.assertEqual(self.history.get_line(i).encode(), line.encode())
+            self.assertEqual(self.history.get_line(0).encode(), lines[0].encode())
+
+        self.assertEqual(len(self.history), 20)
+        self.assertEqual([self.history.get_line(i).encode() for i in range(20)],
+                         [line.encode() for line in lines])
+
+        self.assertRaises(IndexError, self.history.get_line, 20)
+
+    def test_close_removes_files(self):
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+        self.history.append(create_line(0).encode())
+
+        if os.name != 'nt':
+            #removed right after they were created
+            self.assertEqual(os.listdir(self.spill_dir), [])
+
+        self.history.close()
+
+        self.assertEqual(os.listdir(self.spill_dir), [])
+        self.assertEqual(len(self.history), 0)
+
+    def test_append_after_close(self):
+        self.history.append(create_line(0).encode())
+        self.history.close()
+
+        self.history.append(create_line(1).encode())
+
+        self.assertEqual(len(self.history), 1)
+        self.assertEqual(self.history.get_line(0).encode(), create_line(1).encode())
+
+
+class HistoryIndexTest(unittest.TestCase):
+    def create_index(self, texts, block_lines = 4, max_lines = None):
+        index = HistoryIndex(block_lines, max_lines)
+
+        for text in texts:
+            index.add_line(text)
+
+        return index
+
+    def test_match_in_line_after_match_over_lines(self):
+        index = self.create_index([u'foo', u'bar foo  bar', u'x foo', u'bar',
+                                   u'foo bar', u'', u'zz foo', u'  bar foo bar'])
+        pattern = compile_pattern(r'foo\s+bar', True)
+
+        self.assertEqual(index.find(pattern, (0, -1), False), (1, 4, 12))
+        self.assertEqual(index.find(pattern, (1, 4), False), (4, 0, 7))
+        self.assertEqual(index.find(pattern, (4, 0), False), (7, 6, 13))
+        self.assertEqual(index.find(pattern, (7, 6), False), None)
+        self.assertEqual(index.find(pattern, (100, 0), True), (7, 6, 13))
+
+    def test_match_in_screen_lines(self):
+        index = self.create_index([u'foo', u'bar'])
+        pattern = compile_pattern(r'foo\s+bar', True)
+
+        self.assertEqual(index.find(pattern, (0, -1), False, [u'foo', u'foo bar']), (3, 0, 7))
+
+    def test_remove_last_line(self):
+        index = self.create_index([u'l%d' % i for i in range(5)])
+
+        index.remove_last_line()
+        index.remove_last_line()
+
+        self.assertEqual(index.get_end_serial(), 3)
+        self.assertEqual(index.find(compile_pattern(u'l3'), (0, -1), False), None)
+        self.assertEqual(index.find(compile_pattern(u'l2'), (0, -1), False), (2, 0, 2))
+
+    def test_max_lines(self):
+        index = self.create_index([u'l%d' % i for i in range(50)], max_lines = 10)
+
+        self.assertEqual(index.get_end_serial(), 50)
+        self.assertEqual(index.find(compile_pattern(u'l40'), (0, -1), False), (40, 0, 3))
+        self.assertEqual(index.find(compile_pattern(u'l1'), (0, -1), False), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
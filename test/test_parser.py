@@ -0,0 +1,281 @@
+# coding=utf-8
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'pymterm'))
+
+import pymterm
+pymterm.debug_log = pymterm.debug_more_log = False
+
+from term import parse_termdata
+from term import termcap_cache
+from term.parse_termdata import CapMatcher, ControlDataParserContext
+from term.terminal_headless import TerminalHeadless
+
+#text, cursor moves, attributes, a line feed, erase, cjk and latin-1 chars,
+#a wrap at the right margin, save and restore of the cursor, delete chars
+STREAM = 'abc\x1b[2;5Hxy\x1b[1;31mred\x1b[0m\r\n\x1b[3Cz\x1b[K' + u'中文é'.encode('utf-8') \
+    + '\x1b[4;18Hwrap!\x1b7\x1b[1;1H\x1b[2P\x1b8.'
+
+STREAM_LINES = [u'c', u'    xyred', u'   z中文é', u'                 wra', u'p!.']
+STREAM_CURSOR = (3, 4)
+
+
+class HeadlessTestBase(unittest.TestCase):
+    rows, cols = 5, 20
+
+    def feed(self, chunks):
+        '''screen lines and cursor after feeding the chunks to a new terminal'''
+        term = TerminalHeadless(rows=self.rows, cols=self.cols)
+
+        try:
+            for data in chunks:
+                term.on_data(data)
+
+            return [line.rstrip() for line in term.get_screen_lines()], term.get_cursor()
+        finally:
+            term.close()
+
+    def split(self, data, size):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class ParserTest(HeadlessTestBase):
+    def test_stream(self):
+        self.assertEqual(self.feed([STREAM]), (STREAM_LINES, STREAM_CURSOR))
+
+    def test_split_at_every_byte(self):
+        for i in range(1, len(STREAM)):
+            self.assertEqual(self.feed([STREAM[:i], STREAM[i:]]), (STREAM_LINES, STREAM_CURSOR),
+                             'split at {}'.format(i))
+
+    def test_chunk_sizes(self):
+        data = STREAM * 40
+
+        expected = self.feed([data])
+
+        for size in (1, 13, 997):
+            self.assertEqual(self.feed(self.split(data, size)), expected, 'chunk size {}'.format(size))
+
+    def test_utf8_split(self):
+        text = u'中é文'.encode('utf-8')
+
+        for i in range(1, len(text)):
+            self.assertEqual(self.feed([text[:i], text[i:]]), ([u'中é文', '', '', '', ''], (5, 0)),
+                             'split at {}'.format(i))
+
+        self.assertEqual(self.feed(self.split(text, 1)), ([u'中é文', '', '', '', ''], (5, 0)))
+
+    def test_cursor_visible(self):
+        term = TerminalHeadless(rows=self.rows, cols=self.cols)
+
+        try:
+            term.on_data('\x1b[?25')
+            term.on_data('l')
+            self.assertFalse(term._cursor_visible)
+
+            term.on_data('\x1b[?25h')
+            self.assertTrue(term._cursor_visible)
+        finally:
+            term.close()
+
+
+class TextRunTest(HeadlessTestBase):
+    rows, cols = 4, 10
+
+    def feed_chars(self, data):
+        '''screen lines and cursor after writing data char by char'''
+        term = TerminalHeadless(rows=self.rows, cols=self.cols)
+
+        try:
+            term.output_normal_data(data)
+
+            return [line.rstrip() for line in term.get_screen_lines()], term.get_cursor()
+        finally:
+            term.close()
+
+    def test_wrap(self):
+        self.assertEqual(self.feed(['0123456789abc']), ([u'0123456789', u'abc', '', ''], (3, 1)))
+        self.assertEqual(self.feed(['0123456', '789abc']), ([u'0123456789', u'abc', '', ''], (3, 1)))
+
+    def test_pending_wrap(self):
+        #the cursor stays past the last col until the next char wraps
+        self.assertEqual(self.feed(['0123456789']), ([u'0123456789', '', '', ''], (10, 0)))
+        self.assertEqual(self.feed(['0123456789', 'x']), ([u'0123456789', u'x', '', ''], (1, 1)))
+        self.assertEqual(self.feed(['0123456789\r']), ([u'0123456789', '', '', ''], (0, 0)))
+        self.assertEqual(self.feed(['0123456789\x1b[Dx']), ([u'01234567x9', '', '', ''], (9, 0)))
+
+    def test_wide_char_at_margin(self):
+        wide = u'中文'.encode('utf-8')
+
+        #the wide char fills the last two cols
+        self.assertEqual(self.feed(['01234567' + wide[:3]]), ([u'01234567中', '', '', ''], (10, 0)))
+
+        #one col is left, the wide char goes to the next line
+        lines, cursor = self.feed(['012345678' + wide[:3]])
+        self.assertEqual(lines, [u'012345678', u'中', '', ''])
+        self.assertEqual(cursor[1], 1)
+
+        for data in ['012345678' + wide, '01234567' + wide, '0123456789' + wide]:
+            self.assertEqual(self.feed([data]), self.feed_chars(data), repr(data))
+
+    def test_same_as_char_path(self):
+        for data in ['0123456789abc', '0123456789' * 5, u'aé中b'.encode('utf-8') * 7]:
+            self.assertEqual(self.feed([data]), self.feed_chars(data), repr(data))
+
+    def test_line_drawing_charset(self):
+        self.assertEqual(self.feed(['\x1b(0lqqk\x1b(Bq']), ([u'┌──┐q', '', '', ''], (5, 0)))
+
+        #g1 is shifted in and out
+        self.assertEqual(self.feed(['\x1b)0\x0eqx\x0fq']), ([u'─│q', '', '', ''], (3, 0)))
+
+    def test_british_charset(self):
+        self.assertEqual(self.feed(['\x1b(Aa#b\x1b(B#']), ([u'a£b#', '', '', ''], (4, 0)))
+
+
+class StateMachineTest(unittest.TestCase):
+    def setUp(self):
+        cap = parse_termdata.parse_cap(':cursor_address=\\E[%i%d;%dH:cursor_up=\\E[A:clr_eol=\\E[K:bell=^G:')
+        self.machine = cap.state_machine
+
+    def parse(self, data):
+        '''(cap, params) at the end of data, None when data leaves the table'''
+        machine = self.machine
+        state = machine.START
+        context = ControlDataParserContext()
+        context.params = []
+        context.digit_value = None
+
+        for c in data:
+            transition = machine.table[state][ord(c)]
+
+            if not transition:
+                return None
+
+            next_state, flush, digit = transition
+
+            if flush and context.digit_value is not None:
+                context.push_param(context.digit_value)
+                context.digit_value = None
+
+            if next_state < 0:
+                return None
+
+            if digit >= 0:
+                base = machine.digit_bases[next_state]
+                context.digit_value = context.digit_value * base + digit if context.digit_value else digit
+
+            state = next_state
+
+        if context.digit_value is not None:
+            context.push_param(context.digit_value)
+
+        return machine.get_cap(state, context.params), context.params
+
+    def test_caps(self):
+        self.assertEqual(self.parse('\x1b[3;14H'), (('cursor_address', True), [3, 14]))
+        self.assertEqual(self.parse('\x1b[A'), (('cursor_up', False), []))
+        self.assertEqual(self.parse('\x1b[K'), (('clr_eol', False), []))
+        self.assertEqual(self.parse('\x07'), (('bell', False), []))
+
+    def test_incomplete_and_unknown(self):
+        self.assertEqual(self.parse('\x1b[3;14'), (None, [3, 14]))
+        self.assertEqual(self.parse('\x1b[Z'), None)
+
+    def test_text_run(self):
+        self.assertEqual(self.machine.text_run_re.match('abc def\x1b[K').group(0), 'abc def')
+        self.assertEqual(self.machine.text_run_re.match('\x07abc'), None)
+
+
+class CapMatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = CapMatcher({'': 'none', '1': 'one', '*,*': 'two'})
+
+    def test_match(self):
+        self.assertEqual(self.matcher.match([]), 'none')
+        self.assertEqual(self.matcher.match([1]), 'one')
+        self.assertEqual(self.matcher.match([3, 14]), 'two')
+        self.assertEqual(self.matcher.match([5]), None)
+
+    def test_memo(self):
+        self.assertEqual(self.matcher.match([3, 14]), 'two')
+        self.assertEqual(self.matcher.memo[(3, 14)], 'two')
+
+        #a memorized params is answered from the memo
+        self.matcher.memo[(3, 14)] = 'memo'
+        self.assertEqual(self.matcher.match([3, 14]), 'memo')
+
+    def test_memo_size(self):
+        max_memo_size = CapMatcher.MAX_MEMO_SIZE
+        CapMatcher.MAX_MEMO_SIZE = 4
+
+        try:
+            for i in range(10):
+                self.assertEqual(self.matcher.match([i, i]), 'two')
+                self.assertTrue(len(self.matcher.memo) <= 4)
+        finally:
+            CapMatcher.MAX_MEMO_SIZE = max_memo_size
+
+
+class TermcapCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+
+        self.get_cache_dir = termcap_cache.get_cache_dir
+        termcap_cache.get_cache_dir = lambda: self.cache_dir
+
+        self.term_path = os.path.join(self.temp_dir, 'test-term.dat')
+
+        with open(self.term_path, 'w') as f:
+            f.write('test-term|test:\\\n\tbell=^G:\n')
+
+        self.key = [('test-term', self.term_path)]
+        self.cap = parse_termdata.parse_cap(':bell=^G:')
+
+    def tearDown(self):
+        termcap_cache.get_cache_dir = self.get_cache_dir
+        shutil.rmtree(self.temp_dir)
+
+    def save(self):
+        cache_path = termcap_cache.get_cache_path(self.term_path, 'test-term')
+        termcap_cache.save(cache_path, self.key, [self.term_path], ':bell=^G:', self.cap)
+
+        return cache_path
+
+    def test_cache_path(self):
+        cache_path = termcap_cache.get_cache_path(self.term_path, 'test-term')
+
+        self.assertEqual(os.path.dirname(cache_path), self.cache_dir)
+        self.assertTrue(os.path.isdir(self.cache_dir))
+        self.assertNotEqual(cache_path,
+                            termcap_cache.get_cache_path(os.path.join(self.temp_dir, 'other', 'test-term.dat'),
+                                                         'test-term'))
+
+    def test_load(self):
+        cache_path = self.save()
+
+        cap_str, cap = termcap_cache.load(cache_path, self.key)
+
+        self.assertEqual(cap_str, ':bell=^G:')
+        self.assertEqual(sorted(cap.cmds.keys()), ['bell'])
+
+    def test_changed_term_data(self):
+        cache_path = self.save()
+
+        mtime = os.path.getmtime(self.term_path)
+        os.utime(self.term_path, (mtime + 10, mtime + 10))
+
+        self.assertEqual(termcap_cache.load(cache_path, self.key), None)
+
+    def test_other_key(self):
+        cache_path = self.save()
+
+        self.assertEqual(termcap_cache.load(cache_path, [('other-term', self.term_path)]), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
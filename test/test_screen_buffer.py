@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'pymterm'))
+
+import pymterm
+pymterm.debug_log = pymterm.debug_more_log = False
+
+from term.terminal_headless import TerminalHeadless, HeadlessConfig
+
+
+class ScrollingRegionTestBase(unittest.TestCase):
+    def setUp(self):
+        self.term = TerminalHeadless(HeadlessConfig(config={'render': {'frame_rate': 0}}),
+                                     rows=10, cols=20)
+
+        self.term.on_data(''.join(['line%03d\r\n' % i for i in range(30)]))
+        #scroll lines out of the region rows 3 to 8
+        self.term.on_data('\x1b[3;8r\x1b[8;1H' + ''.join(['\r\nreg%02d' % i for i in range(12)]))
+
+        self.buffer = self.term._screen_buffer
+
+    def tearDown(self):
+        self.term.close()
+
+    def get_visible_texts(self):
+        return [line.get_text().rstrip() for line in self.buffer.get_visible_lines()]
+
+
+class ScrollingRegionSelectionTest(ScrollingRegionTestBase):
+    def select_rows(self, first_row, last_row):
+        self.buffer.set_selection((0, first_row), (20, last_row))
+
+        return [text.rstrip() for text in self.buffer.get_selection_text()]
+
+    def test_select_screen(self):
+        texts = self.get_visible_texts()
+
+        self.assertEqual(self.select_rows(0, 9), texts)
+        self.assertEqual(self.select_rows(2, 3), texts[2:4])
+
+    def test_select_history(self):
+        self.buffer.view_history(True)
+        self.buffer.view_history_pageup()
+
+        texts = self.get_visible_texts()
+
+        self.assertEqual(texts[0], 'line023')
+        self.assertEqual(self.select_rows(0, 0), ['line023'])
+        self.assertEqual(self.select_rows(9, 9), [texts[9]])
+        self.assertEqual(self.select_rows(0, 9), texts)
+        self.assertEqual([row for row, b, e in self.buffer.get_selection_highlights()],
+                         range(10))
+
+    def test_selection_follows_scroll(self):
+        self.buffer.view_history(True)
+        self.buffer.view_history_pageup()
+
+        self.assertEqual(self.select_rows(0, 1), ['line023', 'line024'])
+
+        self.buffer.view_history_lineup()
+
+        self.assertEqual([row for row, b, e in self.buffer.get_selection_highlights()], [1, 2])
+        self.assertEqual([text.rstrip() for text in self.buffer.get_selection_text()],
+                         ['line023', 'line024'])
+
+
+class ScrollingRegionSearchTest(ScrollingRegionTestBase):
+    def get_highlighted_texts(self):
+        lines = self.buffer.get_visible_lines()
+
+        return [lines[row].get_text(b, e) for row, b, e in self.buffer.get_search_highlights()]
+
+    def test_search_screen_in_history_view(self):
+        self.assertTrue(self.buffer.search('line029'))
+
+        self.buffer.view_history(True)
+        self.assertEqual(self.get_highlighted_texts(), ['line029'])
+
+        self.buffer.view_history_lineup()
+        self.assertEqual(self.get_highlighted_texts(), ['line029'])
+
+    def test_search_history(self):
+        self.assertTrue(self.buffer.search('line010'))
+
+        self.assertTrue(self.buffer.is_view_history())
+        self.assertEqual(self.get_highlighted_texts(), ['line010'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding=utf-8
+import os
+import random
+import struct
+import argparse
+
+CORPUS_ROWS = 24
+CORPUS_COLS = 80
+
+WORDS = ['the', 'terminal', 'emulator', 'python', 'session', 'buffer', 'screen',
+         'line', 'cursor', 'scroll', 'history', 'render', 'color', 'data', 'of',
+         'and', 'to', 'in', 'is', 'for', 'with', 'on', 'as', 'by', 'from']
+
+FILE_EXTS = ['.py', '.c', '.h', '.txt', '.md', '.json', '.so', '.png', '.tar.gz', '']
+
+CJK_CHARS = [u'中文字符终端模拟器显示滚动历史记录缓冲区光标颜色渲染',
+             u'日本語のテキストを表示するターミナル',
+             u'한국어텍스트를표시하는터미널']
+
+KEYWORDS = ['def', 'class', 'return', 'import', 'if', 'else', 'for', 'while', 'self']
+
+def gen_words(r, count):
+    return ' '.join([r.choice(WORDS) for i in range(count)])
+
+def gen_cat(r, size):
+    '''plain text, like cat of a large file'''
+    parts = []
+    total = 0
+    while total < size:
+        line = gen_words(r, r.randint(0, 14)) + '\r\n'
+        parts.append(line)
+        total += len(line)
+    return ''.join(parts)
+
+def gen_ls_color(r, size):
+    '''ls --color -R of a big tree'''
+    parts = []
+    total = 0
+    while total < size:
+        header = './{}:\r\n'.format('/'.join([r.choice(WORDS) for i in range(r.randint(1, 4))]))
+        names = []
+        for i in range(r.randint(5, 40)):
+            name = r.choice(WORDS) + '_' + str(r.randint(0, 999))
+            kind = r.random()
+            if kind < .2:
+                names.append('\x1b[01;34m' + name + '\x1b[0m')
+            elif kind < .3:
+                names.append('\x1b[01;32m' + name + '\x1b[0m')
+            elif kind < .35:
+                names.append('\x1b[01;36m' + name + '\x1b[0m')
+            elif kind < .4:
+                names.append('\x1b[01;31m' + name + '.tar.gz\x1b[0m')
+            else:
+                names.append(name + r.choice(FILE_EXTS))
+        lines = []
+        for i in range(0, len(names), 4):
+            lines.append('  '.join(names[i:i + 4]))
+        block = header + '\r\n'.join(lines) + '\r\n\r\n'
+        parts.append(block)
+        total += len(block)
+    return ''.join(parts)
+
+def gen_code_line(r):
+    parts = [' ' * (4 * r.randint(0, 3))]
+    width = len(parts[0])
+    for i in range(r.randint(1, 8)):
+        if r.random() < .25:
+            word = r.choice(KEYWORDS)
+            color = '\x1b[38;5;130m'
+        elif r.random() < .1:
+            word = '"' + gen_words(r, 2) + '"'
+            color = '\x1b[38;5;28m'
+        else:
+            word = r.choice(WORDS)
+            color = None
+        if width + len(word) + 1 > CORPUS_COLS - 4:
+            break
+        parts.append(color + word + '\x1b[m' if color else word)
+        width += len(word) + 1
+    return ' '.join(parts)
+
+def gen_vim_scroll(r, size):
+    '''vim scrolling a source file with syntax highlight'''
+    parts = ['\x1b[?1049h\x1b[?25l\x1b[H\x1b[2J']
+    for row in range(CORPUS_ROWS - 1):
+        parts.append('\x1b[{};1H'.format(row + 1) + gen_code_line(r))
+    total = 0
+    lineno = CORPUS_ROWS - 1
+    while total < size:
+        lineno += 1
+        if r.random() < .8:
+            frame = '\x1b[?25l\x1b[1;{}r\x1b[{};1H\r\n{}\x1b[r'.format(
+                CORPUS_ROWS - 1, CORPUS_ROWS - 1, gen_code_line(r))
+        else:
+            frame = '\x1b[?25l\x1b[1;{}r\x1b[1;1H\x1bM{}\x1b[r'.format(
+                CORPUS_ROWS - 1, gen_code_line(r))
+        frame += '\x1b[{};1H\x1b[K"file.py" {}L, {}C{}\x1b[{};{}H\x1b[?25h'.format(
+            CORPUS_ROWS, lineno, lineno * 40, ' ' * 20, r.randint(1, CORPUS_ROWS - 1), r.randint(1, 40))
+        parts.append(frame)
+        total += len(frame)
+    parts.append('\x1b[?1049l')
+    return ''.join(parts)
+
+def gen_htop(r, size):
+    '''htop refreshing its whole screen'''
+    parts = ['\x1b[?1049h\x1b[?25l\x1b[H\x1b[2J']
+    total = 0
+    while total < size:
+        frame = []
+        for cpu in range(4):
+            used = r.randint(0, 40)
+            frame.append('\x1b[{};3H\x1b[36m{}\x1b[39m\x1b[1m[\x1b[32m{}\x1b[31m{}\x1b[39m{}{:5.1f}%\x1b[0m]'.format(
+                cpu + 1, cpu + 1, '|' * (used // 2), '|' * (used - used // 2), ' ' * (40 - used), used * 2.5))
+        frame.append('\x1b[6;1H\x1b[30m\x1b[42m  PID USER      PRI  NI  VIRT   RES   SHR S CPU% MEM%   TIME+  Command{}\x1b[0m'.format(
+            ' ' * 9))
+        for row in range(7, CORPUS_ROWS):
+            frame.append('\x1b[{};1H{:5d} {:<8s}  20   0 {:5d}M {:4d}M {:4d}M S {:4.1f} {:4.1f}  0:{:02d}.{:02d} \x1b[1m{}\x1b[0m\x1b[K'.format(
+                row, r.randint(1, 99999), r.choice(WORDS), r.randint(1, 999), r.randint(1, 999),
+                r.randint(1, 99), r.random() * 100, r.random() * 10, r.randint(0, 59), r.randint(0, 99),
+                r.choice(WORDS)))
+        frame = ''.join(frame)
+        parts.append(frame)
+        total += len(frame)
+    parts.append('\x1b[?1049l')
+    return ''.join(parts)
+
+def gen_cjk(r, size):
+    '''text file mostly made of CJK wide chars'''
+    parts = []
+    total = 0
+    while total < size:
+        chars = r.choice(CJK_CHARS)
+        line = []
+        for i in range(r.randint(0, 60)):
+            line.append(r.choice(chars) if r.random() < .85 else r.choice(' abc123,.'))
+        line = (u''.join(line) + u'\r\n').encode('utf-8')
+        parts.append(line)
+        total += len(line)
+    return ''.join(parts)
+
+CORPORA = [('cat', gen_cat),
+           ('ls_color', gen_ls_color),
+           ('vim_scroll', gen_vim_scroll),
+           ('htop', gen_htop),
+           ('cjk', gen_cjk)]
+
+def write_dump(path, data, r, max_read = 4096):
+    # split the data the way reads from a pty do, and write it in
+    # the --dump_data format: 4 bytes length in network order then data
+    with open(path, 'wb') as f:
+        pos = 0
+        while pos < len(data):
+            n = max_read if r.random() < .7 else r.randint(1, max_read)
+            chunk = data[pos:pos + n]
+            f.write(struct.pack('!i', len(chunk)))
+            f.write(chunk)
+            pos += n
+
+def read_dump(path):
+    chunks = []
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(4)
+            if not data or len(data) != 4:
+                break
+            data_len = struct.unpack('!i', data)[0]
+            data = f.read(data_len)
+            chunks.append(data)
+            if data_len != len(data):
+                break
+    return chunks
+
+def get_corpus_path(corpus_dir, name):
+    return os.path.join(corpus_dir, name + '.dump')
+
+def generate(corpus_dir, size, seed = 1):
+    if not os.path.exists(corpus_dir):
+        os.makedirs(corpus_dir)
+
+    paths = []
+    for name, gen in CORPORA:
+        r = random.Random('{}-{}'.format(seed, name))
+        path = get_corpus_path(corpus_dir, name)
+        write_dump(path, gen(r, size), r)
+        paths.append(path)
+
+    return paths
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='generate the benchmark corpora in --dump_data format, screen size is {}x{}'.format(CORPUS_COLS, CORPUS_ROWS))
+    parser.add_argument('--corpus_dir', type=str, default=os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bench_corpus'), help='directory to write the corpora to', required = False)
+    parser.add_argument('--size', type=int, default=256 * 1024, help='approximate size in bytes of each corpus', required = False)
+    parser.add_argument('--seed', type=int, default=1, help='random seed', required = False)
+
+    return parser
+
+if __name__ == '__main__':
+    args = parse_args().parse_args()
+
+    for path in generate(args.corpus_dir, args.size, args.seed):
+        print 'generated', path, os.path.getsize(path)
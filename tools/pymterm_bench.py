@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+TOOLS_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, '..', 'pymterm'))
+
+import pymterm
+pymterm.debug_log = pymterm.debug_more_log = False
+
+import gen_bench_corpus
+
+from term.terminal import Terminal
+from term.terminal_headless import TerminalHeadless, HeadlessConfig
+
+STAGES = ['parse', 'buffer', 'render']
+
+try:
+    import resource
+
+    def get_peak_rss_kb():
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on mac, kilo bytes on linux
+        return rss / 1024 if sys.platform == 'darwin' else rss
+except ImportError:
+    def get_peak_rss_kb():
+        return -1
+
+
+class ParseOnlyTerminal(Terminal):
+    def __init__(self, cfg):
+        Terminal.__init__(self, cfg)
+        self.seq_count = 0
+
+    def on_control_data(self, cap_turple):
+        self.seq_count += 1
+
+    def output_data(self, c):
+        pass
+
+    def output_text_run(self, data):
+        pass
+
+
+def count_sequences(term):
+    # the terminal only counts the caps while tracing, the sequences
+    # are counted by wrapping the instance like the trace does
+    count = [0]
+    on_control_data = term.on_control_data
+
+    def counted_on_control_data(cap_turple):
+        count[0] += 1
+        on_control_data(cap_turple)
+
+    term.on_control_data = counted_on_control_data
+
+    return count
+
+def run_parse(chunks):
+    term = ParseOnlyTerminal(HeadlessConfig())
+
+    begin = time.time()
+    for data in chunks:
+        term.on_data(data)
+
+    return time.time() - begin, term.seq_count
+
+def run_buffer(chunks):
+    term = TerminalHeadless(rows=gen_bench_corpus.CORPUS_ROWS,
+                            cols=gen_bench_corpus.CORPUS_COLS)
+    seq_count = count_sequences(term)
+
+    begin = time.time()
+    for data in chunks:
+        term.on_data(data)
+    elapsed = time.time() - begin
+
+    term.close()
+
+    return elapsed, seq_count[0]
+
+def run_render(chunks):
+    # what a renderer does on every refresh: take the visible lines,
+    # and work out the colors of the lines not in its line cache
+    prepared_lines = set()
+    render_time = [0.0]
+
+    def prepare_lines():
+        for line in term.term_widget.lines:
+            key = line.get_hash_value()
+
+            if key in prepared_lines:
+                continue
+
+            if len(prepared_lines) > 1000:
+                prepared_lines.clear()
+            prepared_lines.add(key)
+
+            for cell in line.get_cells():
+                term.determin_colors(cell.get_attr())
+
+    term = TerminalHeadless(HeadlessConfig(),
+                            rows=gen_bench_corpus.CORPUS_ROWS,
+                            cols=gen_bench_corpus.CORPUS_COLS)
+    seq_count = count_sequences(term)
+
+    # a frame is drawn after every chunk here instead of on the frame
+    # thread, so all of them are timed and none is left pending
+    for data in chunks:
+        term.on_data(data)
+
+        begin = time.time()
+        term.publish_snapshot()
+        term.lock_display_data_exec(prepare_lines)
+        render_time[0] += time.time() - begin
+
+    term.close()
+
+    return render_time[0], seq_count[0]
+
+def run_stage(corpus_path, stage):
+    chunks = gen_bench_corpus.read_dump(corpus_path)
+    size = sum([len(data) for data in chunks])
+
+    elapsed, seq_count = globals()['run_' + stage](chunks)
+    elapsed = max(elapsed, 1e-9)
+
+    return {'stage': stage,
+            'bytes': size,
+            'seconds': elapsed,
+            'mb_per_sec': size / elapsed / 1024 / 1024,
+            'seq_per_sec': seq_count / elapsed,
+            'peak_rss_kb': get_peak_rss_kb()}
+
+def run_stage_in_process(corpus_path, stage):
+    # one process for each stage, so the peak rss belongs to the stage
+    output = subprocess.check_output([sys.executable, os.path.realpath(__file__),
+                                      '--run_stage', stage, corpus_path])
+    return json.loads(output.splitlines()[-1])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='feed recorded terminal data into the headless terminal and report the throughput of each stage')
+    parser.add_argument('--corpus_dir', type=str, default=os.path.join(TOOLS_DIR, 'bench_corpus'), help='directory of the corpora, generated when missing', required = False)
+    parser.add_argument('--size', type=int, default=256 * 1024, help='approximate size in bytes of each generated corpus', required = False)
+    parser.add_argument('--regenerate', action='store_true', help='generate the corpora even if they exist', required = False)
+    parser.add_argument('--stage', choices=STAGES, action='append', dest='stages', help='only run the given stage, can be given more than once', required = False)
+    parser.add_argument('--output', type=str, default=None, help='also write the results to the given file as json', required = False)
+    parser.add_argument('--run_stage', choices=STAGES, default=None, help=argparse.SUPPRESS, required = False)
+    parser.add_argument('dumps', metavar='dump_file', type=str, nargs='*', help='--dump_data recordings to run instead of the generated corpora')
+
+    return parser
+
+if __name__ == '__main__':
+    args = parse_args().parse_args()
+
+    if args.run_stage:
+        print json.dumps(run_stage(args.dumps[0], args.run_stage))
+        sys.exit(0)
+
+    dumps = args.dumps
+
+    if len(dumps) == 0:
+        dumps = [gen_bench_corpus.get_corpus_path(args.corpus_dir, name) for name, gen in gen_bench_corpus.CORPORA]
+
+        if args.regenerate or not all([os.path.exists(p) for p in dumps]):
+            gen_bench_corpus.generate(args.corpus_dir, args.size)
+
+    results = []
+
+    print '{:<16s} {:<8s} {:>10s} {:>10s} {:>12s} {:>12s}'.format('corpus', 'stage', 'bytes', 'MB/s', 'seq/s', 'peak rss KB')
+
+    for path in dumps:
+        name = os.path.splitext(os.path.basename(path))[0]
+
+        for stage in args.stages if args.stages else STAGES:
+            result = run_stage_in_process(path, stage)
+            result['corpus'] = name
+            results.append(result)
+
+            print '{:<16s} {:<8s} {:>10d} {:>10.3f} {:>12.0f} {:>12d}'.format(
+                name, stage, result['bytes'], result['mb_per_sec'], result['seq_per_sec'], result['peak_rss_kb'])
+            sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)